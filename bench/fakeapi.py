@@ -0,0 +1,140 @@
+"""Локальный фейковый Telegram Bot API для нагрузочных тестов
+
+Отвечает на запросы aiogram по HTTP так же, как настоящий сервер
+(минимально правдоподобные объекты), и запоминает, что бот показал
+каждому чату: последний текст и клавиатуру, а также всплывающие окна
+ответов на нажатия кнопок.
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+from aiohttp import web
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+
+FAKE_TOKEN = "123456:bench"
+BOT_USER = {"id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+class ChatView:
+    """Что видит пользователь в чате с ботом"""
+    __slots__ = ("text", "markup", "message_id")
+
+    def __init__(self):
+        self.text: str = ""
+        self.markup: Optional[dict] = None
+        self.message_id: int = 0
+
+
+class FakeTelegramAPI:
+    """aiohttp-сервер, имитирующий https://api.telegram.org/bot<token>/<method>"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.chats: Dict[int, ChatView] = defaultdict(ChatView)
+        # callback_query_id -> текст всплывающего окна (answerCallbackQuery с show_alert)
+        self.alerts: Dict[str, str] = {}
+        self.calls: Counter = Counter()
+        self.sent_documents: List[dict] = []
+        self._message_ids = itertools.count(1000)
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    def make_bot(self) -> Bot:
+        """Бот, все запросы которого идут в этот сервер"""
+        session = AiohttpSession(api=TelegramAPIServer.from_base(self.url))
+        return Bot(FAKE_TOKEN, session=session)
+
+    def view(self, chat_id: int) -> ChatView:
+        return self.chats[chat_id]
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        handler = getattr(self, f"_m_{method}", None)
+        result = handler(params) if handler else True
+        return web.json_response({"ok": True, "result": result})
+
+    # ===== Методы API =====
+
+    def _message(self, chat_id: int, text: str = "", message_id: Optional[int] = None) -> dict:
+        return {
+            "message_id": message_id or next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": text,
+        }
+
+    def _show(self, params: dict, message_id: int):
+        chat_id = int(params.get("chat_id", 0))
+        view = self.chats[chat_id]
+        view.text = params.get("text", "")
+        markup = params.get("reply_markup")
+        if markup:
+            view.markup = json.loads(markup)
+        elif "message_id" in params:
+            # Редактирование без клавиатуры убирает её
+            view.markup = None
+        view.message_id = message_id
+        return chat_id
+
+    def _m_getMe(self, params: dict):
+        return BOT_USER
+
+    def _m_sendMessage(self, params: dict):
+        message = self._message(int(params.get("chat_id", 0)), params.get("text", ""))
+        self._show(params, message["message_id"])
+        return message
+
+    def _m_editMessageText(self, params: dict):
+        message_id = int(params.get("message_id", 0))
+        chat_id = self._show(params, message_id)
+        return self._message(chat_id, params.get("text", ""), message_id)
+
+    def _m_editMessageReplyMarkup(self, params: dict):
+        chat_id = int(params.get("chat_id", 0))
+        markup = params.get("reply_markup")
+        self.chats[chat_id].markup = json.loads(markup) if markup else None
+        return self._message(chat_id, self.chats[chat_id].text, int(params.get("message_id", 0)))
+
+    def _m_sendDocument(self, params: dict):
+        self.sent_documents.append({k: v for k, v in params.items() if isinstance(v, str)})
+        return self._message(int(params.get("chat_id", 0)))
+
+    def _m_answerCallbackQuery(self, params: dict):
+        # show_alert — это то, что пользователь видит как отказ
+        if params.get("show_alert") in ("true", "True", "1"):
+            self.alerts[params.get("callback_query_id", "")] = params.get("text", "")
+        return True
+
+
+def buttons(markup: Optional[dict]) -> List[dict]:
+    """Все inline-кнопки клавиатуры подряд"""
+    if not markup:
+        return []
+    return [button for row in markup.get("inline_keyboard", []) for button in row]
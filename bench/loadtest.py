@@ -0,0 +1,370 @@
+"""Нагрузочный тест: N клиентов одновременно проходят запись
+
+Пример:
+    python bench/loadtest.py --clients 200 --concurrency 50
+    python bench/loadtest.py --clients 500 --api-latency-ms 50 --json result.json
+
+Работает настоящий Dispatcher (register_handlers + middleware), БД —
+временный файл (DB_PATH задаётся до импорта модулей бота), Telegram API —
+локальный фейковый сервер (bench/fakeapi.py).
+
+Шаги клиента: /book → выбор услуг (toggle) → services_done → pick_date →
+slotrange → confirm_booking. После прогона проверяется, что ни один слот
+не достался двум клиентам.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.fakeapi import BOT_USER, FakeTelegramAPI, buttons  # noqa: E402
+
+ADMIN_CHAT = 1
+FIRST_CLIENT_ID = 100000
+
+# Порядок шагов в отчёте
+STEPS = ("book", "toggle", "services_done", "next_month", "pick_date", "slotrange", "confirm")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100, help="сколько клиентов проходят запись")
+    parser.add_argument("--concurrency", type=int, default=50, help="сколько клиентов активны одновременно")
+    parser.add_argument("--days", type=int, default=7, help="на сколько дней вперёд создать окна")
+    parser.add_argument("--hours", default="9-20", help="часы окон, например 9-20")
+    parser.add_argument("--think-ms", type=float, default=0, help="пауза клиента между шагами (до N мс)")
+    parser.add_argument("--api-latency-ms", type=float, default=0, help="задержка ответа фейкового API")
+    parser.add_argument("--db", help="файл БД (по умолчанию временный)")
+    parser.add_argument("--seed", type=int, default=1, help="seed генератора случайных чисел")
+    parser.add_argument("--json", help="записать результат в JSON-файл")
+    return parser.parse_args()
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class LockErrors(logging.Handler):
+    """Считает сообщения лога о блокировке БД (обработчики ловят их сами)"""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord):
+        if "locked" in record.getMessage() or (record.exc_info and "locked" in str(record.exc_info[1])):
+            self.count += 1
+
+
+async def seed_database(args, hours: range):
+    """Клиенты с телефонами и почасовые окна на args.days дней начиная с завтра"""
+    from database import connect, db_init
+
+    await db_init()
+    start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    slots = [
+        ((start + timedelta(days=day)).replace(hour=hour).isoformat(),)
+        for day in range(args.days)
+        for hour in hours
+    ]
+    users = [
+        (FIRST_CLIENT_ID + i, f"Клиент {i}", f"+7900{FIRST_CLIENT_ID + i:07d}")
+        for i in range(args.clients)
+    ]
+    async with connect() as db:
+        await db.executemany("INSERT OR IGNORE INTO timeslots(dt) VALUES (?)", slots)
+        await db.executemany("INSERT OR IGNORE INTO users(tg_id, name, phone) VALUES (?, ?, ?)", users)
+        await db.commit()
+    return len(slots)
+
+
+class Client:
+    """Один пользователь, нажимающий кнопки, которые ему показал бот"""
+
+    def __init__(self, tg_id: int, run: "LoadRun"):
+        self.tg_id = tg_id
+        self.run = run
+        self.user = {"id": tg_id, "is_bot": False, "first_name": f"Клиент {tg_id - FIRST_CLIENT_ID}"}
+        self.presses = 0
+        self.slot_ids: List[int] = []
+
+    @property
+    def view(self):
+        return self.run.api.view(self.tg_id)
+
+    async def _feed(self, step: str, update: dict):
+        from aiogram.types import Update
+
+        if self.run.think:
+            await asyncio.sleep(self.run.rnd.uniform(0, self.run.think))
+        self.run.updates += 1
+        started = time.perf_counter()
+        try:
+            await self.run.dp.feed_update(self.run.bot, Update.model_validate(update))
+        except Exception as e:
+            self.run.errors[f"{step}: {type(e).__name__}: {e}"] += 1
+            if isinstance(e, sqlite3.OperationalError) and "locked" in str(e):
+                self.run.lock_errors += 1
+            raise
+        finally:
+            self.run.timings[step].append(time.perf_counter() - started)
+
+    async def send(self, step: str, text: str):
+        self.run.update_id += 1
+        await self._feed(step, {
+            "update_id": self.run.update_id,
+            "message": {
+                "message_id": self.run.update_id,
+                "date": int(time.time()),
+                "chat": {"id": self.tg_id, "type": "private"},
+                "from": self.user,
+                "text": text,
+            },
+        })
+
+    async def press(self, step: str, data: str) -> Optional[str]:
+        """Нажать кнопку; возвращает текст всплывающего окна-отказа (или None)"""
+        self.run.update_id += 1
+        self.presses += 1
+        query_id = f"{self.tg_id}-{self.presses}"
+        await self._feed(step, {
+            "update_id": self.run.update_id,
+            "callback_query": {
+                "id": query_id,
+                "from": self.user,
+                "chat_instance": str(self.tg_id),
+                "data": data,
+                "message": {
+                    "message_id": self.view.message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": self.tg_id, "type": "private"},
+                    "from": BOT_USER,
+                    "text": self.view.text,
+                },
+            },
+        })
+        return self.run.api.alerts.pop(query_id, None)
+
+    def _callbacks(self, prefix: str, text_prefix: str = "") -> List[str]:
+        return [
+            button["callback_data"] for button in buttons(self.view.markup)
+            if button.get("callback_data", "").startswith(prefix) and button["text"].startswith(text_prefix)
+        ]
+
+    async def book(self) -> str:
+        """Пройти запись целиком; возвращает исход"""
+        rnd = self.run.rnd
+        await self.send("book", "/book")
+        services = self._callbacks("toggle:")
+        if not services:
+            return "no_services"
+
+        for data in rnd.sample(services, rnd.randint(1, min(2, len(services)))):
+            await self.press("toggle", data)
+        await self.press("services_done", "services_done")
+
+        # Дни со свободными окнами отмечены в календаре как [N]
+        dates = self._callbacks("pick_date:", "[")
+        if not dates:
+            next_month = self._callbacks("next_month:")
+            if next_month:
+                await self.press("next_month", next_month[0])
+                dates = self._callbacks("pick_date:", "[")
+
+        rnd.shuffle(dates)
+        for data in dates[:3]:
+            if await self.press("pick_date", data) is None:
+                break
+        else:
+            return "no_slots" if dates else "no_dates"
+
+        ranges = self._callbacks("slotrange:")
+        if not ranges:
+            return "no_slots"
+        choice = rnd.choice(ranges)
+        await self.press("slotrange", choice)
+
+        alert = await self.press("confirm", "confirm_booking")
+        if alert is None:
+            self.slot_ids = list(map(int, choice.split(":", 2)[2].split(",")))
+            return "booked"
+        return "conflict" if "занят" in alert else "rejected"
+
+
+class LoadRun:
+    """Состояние одного прогона"""
+
+    def __init__(self, args, api: FakeTelegramAPI, dp, bot):
+        self.api = api
+        self.dp = dp
+        self.bot = bot
+        self.rnd = random.Random(args.seed)
+        self.think = args.think_ms / 1000
+        self.update_id = 0
+        self.updates = 0
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.outcomes: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.lock_errors = 0
+
+
+async def check_double_booking(clients: List[Client]) -> List[str]:
+    """Проблемы целостности: слот у двух клиентов, чужой booked_by, дубли записей"""
+    from database import connect
+
+    problems = []
+    owners: Dict[int, int] = {}
+    for client in clients:
+        for slot_id in client.slot_ids:
+            if slot_id in owners:
+                problems.append(f"слот {slot_id} подтверждён клиентам {owners[slot_id]} и {client.tg_id}")
+            owners[slot_id] = client.tg_id
+
+    async with connect() as db:
+        cur = await db.execute("""
+            SELECT t.id, u.tg_id FROM timeslots t
+            LEFT JOIN users u ON u.id = t.booked_by_user_id
+            WHERE t.is_booked = 1
+        """)
+        booked = dict(await cur.fetchall())
+        cur = await db.execute("SELECT timeslot_id, COUNT(*) FROM bookings GROUP BY timeslot_id HAVING COUNT(*) > 1")
+        for slot_id, count in await cur.fetchall():
+            problems.append(f"на слот {slot_id} {count} записи")
+
+    for slot_id, tg_id in owners.items():
+        if booked.get(slot_id) != tg_id:
+            problems.append(f"слот {slot_id} подтверждён {tg_id}, а в БД занят {booked.get(slot_id)}")
+    extra = set(booked) - set(owners)
+    if extra:
+        problems.append(f"занято слотов без подтверждения клиенту: {len(extra)}")
+    return problems
+
+
+async def run(args) -> dict:
+    from aiogram import Dispatcher
+    from handlers import register_handlers
+    from middlewares import setup_middlewares
+    from utils.settings import load_settings
+
+    first, last = map(int, args.hours.split("-"))
+    slots_total = await seed_database(args, range(first, last + 1))
+    await load_settings()
+
+    api = FakeTelegramAPI(latency=args.api_latency_ms / 1000)
+    await api.start()
+    bot = api.make_bot()
+    dp = Dispatcher()
+    register_handlers(dp)
+    setup_middlewares(dp, bot)
+
+    lock_log = LockErrors()
+    logging.getLogger().addHandler(lock_log)
+
+    load = LoadRun(args, api, dp, bot)
+    clients = [Client(FIRST_CLIENT_ID + i, load) for i in range(args.clients)]
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(client: Client):
+        async with semaphore:
+            try:
+                load.outcomes[await client.book()] += 1
+            except Exception:
+                load.outcomes["error"] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(client) for client in clients))
+    elapsed = time.perf_counter() - started
+
+    problems = await check_double_booking(clients)
+    await bot.session.close()
+    await api.stop()
+
+    return {
+        "clients": args.clients,
+        "concurrency": args.concurrency,
+        "slots": slots_total,
+        "seconds": round(elapsed, 3),
+        "updates": load.updates,
+        "updates_per_second": round(load.updates / elapsed, 1) if elapsed else 0,
+        "bookings_per_second": round(load.outcomes["booked"] / elapsed, 2) if elapsed else 0,
+        "outcomes": dict(load.outcomes),
+        "steps": {
+            step: {
+                "count": len(load.timings[step]),
+                "p50_ms": round(percentile(load.timings[step], 0.50) * 1000, 2),
+                "p95_ms": round(percentile(load.timings[step], 0.95) * 1000, 2),
+                "p99_ms": round(percentile(load.timings[step], 0.99) * 1000, 2),
+                "max_ms": round(max(load.timings[step]) * 1000, 2),
+            }
+            for step in STEPS if load.timings[step]
+        },
+        "lock_errors": load.lock_errors + lock_log.count,
+        "errors": dict(load.errors.most_common(10)),
+        "api_calls": dict(api.calls),
+        "integrity_problems": problems,
+    }
+
+
+def print_report(result: dict):
+    print(f"Клиентов: {result['clients']} (одновременно до {result['concurrency']}), окон: {result['slots']}")
+    print(f"Время: {result['seconds']} с, обновлений: {result['updates']} "
+          f"({result['updates_per_second']}/с), записей в секунду: {result['bookings_per_second']}")
+    print("Исходы: " + ", ".join(f"{name}={count}" for name, count in sorted(result["outcomes"].items())))
+    print()
+    print(f"{'шаг':<15}{'кол-во':>8}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}{'max мс':>10}")
+    for step, stats in result["steps"].items():
+        print(f"{step:<15}{stats['count']:>8}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+              f"{stats['p99_ms']:>10}{stats['max_ms']:>10}")
+    print()
+    print(f"Ошибок блокировки БД: {result['lock_errors']}")
+    for error, count in result["errors"].items():
+        print(f"  {count}× {error}")
+    if result["integrity_problems"]:
+        print("❌ ДВОЙНОЕ БРОНИРОВАНИЕ:")
+        for problem in result["integrity_problems"]:
+            print(f"  {problem}")
+    else:
+        print("✅ Двойных бронирований нет")
+
+
+def main():
+    args = parse_args()
+
+    # Модули бота читают настройки при импорте — окружение задаётся до них
+    db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "bot.db")
+    os.environ["DB_PATH"] = db_path
+    os.environ.setdefault("BOT_TOKEN", "123456:bench")
+    os.environ["ADMIN_ID"] = str(ADMIN_CHAT)
+    # Клиенты без пауз жмут кнопки быстрее антифлуда — меряем обработку, а не отказы
+    os.environ.setdefault("THROTTLE_MESSAGE_RATE", "0")
+    os.environ.setdefault("THROTTLE_CALLBACK_RATE", "0")
+    logging.basicConfig(level=logging.ERROR, format="%(levelname)s - %(message)s")
+
+    result = asyncio.run(run(args))
+    result["db"] = db_path
+    print_report(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    sys.exit(1 if result["integrity_problems"] else 0)
+
+
+if __name__ == "__main__":
+    main()
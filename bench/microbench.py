@@ -0,0 +1,262 @@
+"""Микробенчмарки горячих путей: свободные окна, календарь, клавиатура услуг,
+выборка кандидатов для напоминаний, маршрутизация текстовых сообщений
+
+Пример:
+    python bench/microbench.py --json before.json
+    python bench/microbench.py --months 6 --slot-minutes 15,60 --occupancy 0.2,0.8 --users 20000
+    python bench/microbench.py --json after.json --compare before.json
+
+Для каждого сочетания шага слотов и занятости генерируется своя БД
+(--db-dir сохраняет их между запусками). Каждый бенчмарк повторяется,
+пока не наберётся --min-time секунд; в отчёт идут медиана, p95 и т.д.
+Сравнивать имеет смысл прогоны с одинаковыми параметрами на одной машине.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Рабочий день в сгенерированном расписании
+DAY_START_HOUR = 9
+DAY_END_HOUR = 21
+SERVICES = 10
+SEED = 42
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=int, default=3, help="сколько месяцев расписания вперёд (и месяц истории)")
+    parser.add_argument("--slot-minutes", default="15,60", help="шаги слотов через запятую")
+    parser.add_argument("--occupancy", default="0.2,0.8", help="доли занятых слотов через запятую")
+    parser.add_argument("--users", type=int, default=5000, help="сколько клиентов в БД")
+    parser.add_argument("--min-time", type=float, default=0.5, help="минимальное время на бенчмарк, с")
+    parser.add_argument("--only", help="запускать только бенчмарки, в имени которых есть эта строка")
+    parser.add_argument("--db-dir", help="каталог для сгенерированных БД (по умолчанию временный)")
+    parser.add_argument("--json", help="записать результаты в JSON-файл")
+    parser.add_argument("--compare", help="JSON предыдущего прогона для сравнения")
+    return parser.parse_args()
+
+
+# ===== ГЕНЕРАЦИЯ ДАННЫХ =====
+
+def generate(path: str, months: int, slot_minutes: int, occupancy: float, users: int):
+    """Заполнить БД: клиенты, услуги, слоты на месяц назад и months вперёд, записи"""
+    rnd = random.Random(SEED)
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    first_day = today - timedelta(days=30)
+    days = 30 + months * 30
+
+    slots = []
+    for day in range(days):
+        current = first_day + timedelta(days=day, hours=DAY_START_HOUR)
+        day_end = first_day + timedelta(days=day, hours=DAY_END_HOUR)
+        while current < day_end:
+            slots.append(current.isoformat())
+            current += timedelta(minutes=slot_minutes)
+
+    db = sqlite3.connect(path)
+    db.executemany(
+        "INSERT INTO users(tg_id, name, phone) VALUES (?, ?, ?)",
+        [(1000000 + i, f"Клиент {i}", f"+7900{i:07d}") for i in range(users)],
+    )
+    db.execute("DELETE FROM services")
+    db.executemany(
+        "INSERT INTO services(name, price, duration_minutes) VALUES (?, ?, ?)",
+        [(f"Услуга {i}", 500 + 100 * i, rnd.choice((30, 60, 90, 120))) for i in range(SERVICES)],
+    )
+    db.executemany("INSERT INTO timeslots(dt) VALUES (?)", [(dt,) for dt in slots])
+
+    slot_ids = [row[0] for row in db.execute("SELECT id FROM timeslots")]
+    booked = rnd.sample(slot_ids, int(len(slot_ids) * occupancy))
+    owners = [(rnd.randint(1, users), slot_id) for slot_id in booked]
+    db.executemany("UPDATE timeslots SET is_booked=1, booked_by_user_id=? WHERE id=?", owners)
+    db.executemany(
+        "INSERT INTO bookings(user_id, timeslot_id, total_price, created_at) VALUES (?, ?, ?, ?)",
+        [(user_id, slot_id, 1000, first_day.isoformat()) for user_id, slot_id in owners],
+    )
+    db.commit()
+    db.execute("ANALYZE")
+    db.close()
+
+
+async def prepare(path: str, args, slot_minutes: int, occupancy: float):
+    """Создать (или переиспользовать) БД сценария и переключить бота на неё"""
+    import database
+
+    database.DB_PATH = path
+    if os.path.exists(path):
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        await database.db_init()
+    generate(path, args.months, slot_minutes, occupancy, args.users)
+
+
+# ===== БЕНЧМАРКИ =====
+
+# Тексты для маршрутизации: кнопки меню, свободный текст, команда
+ROUTING_TEXTS = (
+    "📅 Записаться", "👀 Мои записи", "💰 Услуги и цены", "📍 Контакты",
+    "Сколько стоит дизайн?", "Добрый день! Можно завтра к вам?", "/admin",
+)
+
+
+def routing_benchmarks() -> Dict[str, Callable[[], Awaitable]]:
+    """Прежняя цепочка magic-фильтров (по порядку роутеров) против таблицы триггеров"""
+    from aiogram import F
+    from aiogram.types import Chat, Message
+    from handlers.menu import triggers
+
+    messages = [
+        Message(message_id=1, date=datetime.now(), chat=Chat(id=1, type="private"), text=text)
+        for text in ROUTING_TEXTS
+    ]
+    legacy_filters = [
+        F.text.lower().contains("услу") | F.text.lower().contains("цены"),
+        F.text.contains("Контакт") | F.text.contains("контакт"),
+        F.text.startswith("📅"),
+        F.text.startswith("👀"),
+    ]
+
+    async def filter_chain():
+        for message in messages:
+            for magic in legacy_filters:
+                if magic.resolve(message):
+                    break
+
+    async def trigger_table():
+        for message in messages:
+            triggers.resolve(message.text)
+
+    return {
+        "text_routing_filters": filter_chain,
+        "text_routing_table": trigger_table,
+    }
+
+
+def benchmarks() -> Dict[str, Callable[[], Awaitable]]:
+    from handlers.booking import find_available_slots_for_duration
+    from handlers.reminders import find_reminder_candidates
+    from keyboards.services import render_services_keyboard
+    from utils.calendar import build_calendar
+
+    now = datetime.now()
+    day = (now + timedelta(days=7)).date()
+    next_month = (now.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+    return {
+        "available_slots_60min": lambda: find_available_slots_for_duration(day, 60),
+        "available_slots_180min": lambda: find_available_slots_for_duration(day, 180),
+        "calendar_current_month": lambda: build_calendar(now.year, now.month),
+        "calendar_next_month": lambda: build_calendar(next_month.year, next_month.month),
+        "services_keyboard": lambda: render_services_keyboard({1, 3}),
+        "reminder_candidates_24h": lambda: find_reminder_candidates(
+            "reminded24", now + timedelta(hours=24), now + timedelta(hours=24, minutes=10)),
+        "reminder_candidates_1h": lambda: find_reminder_candidates(
+            "reminded1h", now + timedelta(hours=1), now + timedelta(hours=1, minutes=10)),
+        **routing_benchmarks(),
+    }
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def measure(fn: Callable[[], Awaitable], min_time: float) -> dict:
+    for _ in range(3):
+        await fn()
+
+    timings = []
+    deadline = time.perf_counter() + min_time
+    while time.perf_counter() < deadline or len(timings) < 5:
+        started = time.perf_counter()
+        await fn()
+        timings.append(time.perf_counter() - started)
+
+    return {
+        "runs": len(timings),
+        "median_ms": round(percentile(timings, 0.5) * 1000, 4),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 4),
+        "min_ms": round(min(timings) * 1000, 4),
+        "mean_ms": round(sum(timings) / len(timings) * 1000, 4),
+    }
+
+
+async def run(args, db_dir: str) -> List[dict]:
+    results = []
+    for slot_minutes in map(int, args.slot_minutes.split(",")):
+        for occupancy in map(float, args.occupancy.split(",")):
+            scenario = f"slots{slot_minutes}m_occ{int(occupancy * 100)}_users{args.users}_months{args.months}"
+            await prepare(os.path.join(db_dir, f"{scenario}.db"), args, slot_minutes, occupancy)
+
+            for name, fn in benchmarks().items():
+                if args.only and args.only not in name:
+                    continue
+                stats = await measure(fn, args.min_time)
+                results.append({"scenario": scenario, "benchmark": name, **stats})
+                print(f"{scenario:<40}{name:<28}{stats['median_ms']:>10.3f} мс  p95 {stats['p95_ms']:.3f}  ×{stats['runs']}")
+    return results
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return ""
+
+
+def compare(results: List[dict], path: str):
+    """Разница медиан с предыдущим прогоном"""
+    with open(path, encoding="utf-8") as f:
+        previous = {(r["scenario"], r["benchmark"]): r for r in json.load(f)["results"]}
+
+    print(f"\nСравнение с {path}:")
+    for result in results:
+        old = previous.get((result["scenario"], result["benchmark"]))
+        if not old:
+            continue
+        change = (result["median_ms"] - old["median_ms"]) / old["median_ms"] * 100 if old["median_ms"] else 0
+        print(f"{result['scenario']:<40}{result['benchmark']:<28}"
+              f"{old['median_ms']:>10.3f} → {result['median_ms']:.3f} мс ({change:+.1f}%)")
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault("BOT_TOKEN", "123456:bench")
+    db_dir = args.db_dir or tempfile.mkdtemp(prefix="microbench-")
+    os.makedirs(db_dir, exist_ok=True)
+
+    results = asyncio.run(run(args, db_dir))
+
+    if args.compare:
+        compare(results, args.compare)
+
+    if args.json:
+        report = {
+            "commit": git_commit(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "params": {k: v for k, v in vars(args).items() if k not in ("json", "compare", "db_dir")},
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Воспроизведение записанных обновлений (RECORD_UPDATES) на копии БД
+
+Пример:
+    python bench/replay.py updates.jsonl --db snapshot.db --secret "$RECORD_SECRET" --admin-id 123456
+    python bench/replay.py updates.jsonl.worker* --db snapshot.db --speed 10 --json replay.json
+    python bench/replay.py updates.jsonl --db snapshot.db --speed 0
+
+Снимок БД копируется во временный файл и не меняется. С --secret
+(тем же RECORD_SECRET, что при записи) и настоящим --admin-id клиенты в
+копии получают те же псевдонимы, что и в записи, — воспроизведение идёт
+от лица «знакомых» пользователей. Telegram API — фейковый (bench/fakeapi.py).
+
+--speed 1 — исходный темп, 10 — в 10 раз быстрее, 0 — без пауз.
+Обновления одного пользователя обрабатываются строго по порядку.
+"""
+import argparse
+import asyncio
+import gzip
+import heapq
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterator, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.fakeapi import FakeTelegramAPI  # noqa: E402
+from bench.loadtest import percentile  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="файлы записи (JSON Lines, можно .gz)")
+    parser.add_argument("--db", required=True, help="снимок БД бота")
+    parser.add_argument("--secret", default="", help="RECORD_SECRET, с которым шла запись")
+    parser.add_argument("--admin-id", type=int, default=int(os.getenv("ADMIN_ID", 0)),
+                        help="настоящий ADMIN_ID (для псевдонимов в копии БД)")
+    parser.add_argument("--speed", type=float, default=1.0, help="ускорение (0 — без пауз)")
+    parser.add_argument("--api-latency-ms", type=float, default=0, help="задержка ответа фейкового API")
+    parser.add_argument("--limit", type=int, help="воспроизвести только первые N обновлений")
+    parser.add_argument("--json", help="записать результат в JSON-файл")
+    return parser.parse_args()
+
+
+# ===== ПОДГОТОВКА =====
+
+def copy_snapshot(src: str, dst: str):
+    """Консистентная копия (с учётом WAL) через backup API"""
+    source = sqlite3.connect(f"file:{src}?mode=ro", uri=True)
+    target = sqlite3.connect(dst)
+    source.backup(target)
+    source.close()
+    target.close()
+
+
+def pseudonymize_snapshot(path: str, secret: str, admin_id: int):
+    """Заменить tg_id, имена и телефоны клиентов в копии так же, как при записи"""
+    from middlewares.recorder import pseudonym, pseudonym_phone
+
+    key = secret.encode()
+    db = sqlite3.connect(path)
+    rows = db.execute("SELECT id, tg_id, phone FROM users").fetchall()
+    # Сначала уводим tg_id в отрицательные, чтобы не поймать UNIQUE при перестановке
+    db.execute("UPDATE users SET tg_id = -tg_id")
+    for uid, tg_id, phone in rows:
+        alias = pseudonym(tg_id, key, admin_id)
+        db.execute(
+            "UPDATE users SET tg_id=?, name=?, phone=? WHERE id=?",
+            (alias, f"user{alias % 100000}", pseudonym_phone(alias) if phone else None, uid),
+        )
+    db.commit()
+    db.close()
+
+
+def read_records(path: str) -> Iterator[dict]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                if "u" in record:
+                    yield record
+
+
+def load_records(paths: List[str], limit: int = None) -> List[dict]:
+    """Записи всех файлов (например, по воркерам) в порядке времени"""
+    merged = heapq.merge(*(read_records(path) for path in paths), key=lambda record: record["t"])
+    records = []
+    for record in merged:
+        records.append(record)
+        if limit and len(records) >= limit:
+            break
+    return records
+
+
+def update_kind(update: dict) -> str:
+    """Категория обновления для отчёта: команда, тип сообщения или префикс callback_data"""
+    if "callback_query" in update:
+        return "cb:" + update["callback_query"].get("data", "").split(":")[0]
+    message = update.get("message")
+    if message:
+        text = message.get("text", "")
+        if text.startswith("/"):
+            return "msg:" + text.split()[0].split("@")[0]
+        if "contact" in message:
+            return "msg:contact"
+        if "document" in message:
+            return "msg:document"
+        return "msg:text"
+    return next((key for key in update if key != "update_id"), "unknown")
+
+
+def update_user(update: dict) -> int:
+    from utils.shard import shard_key
+    return shard_key(update)
+
+
+# ===== ВОСПРОИЗВЕДЕНИЕ =====
+
+async def replay(args, records: List[dict]) -> dict:
+    from aiogram import Dispatcher
+    from database import db_init
+    from handlers import register_handlers
+    from middlewares import setup_middlewares
+    from utils.settings import load_settings
+
+    await db_init()
+    await load_settings()
+
+    api = FakeTelegramAPI(latency=args.api_latency_ms / 1000)
+    await api.start()
+    bot = api.make_bot()
+    dp = Dispatcher()
+    register_handlers(dp)
+    setup_middlewares(dp, bot)
+
+    timings: Dict[str, List[float]] = defaultdict(list)
+    lags: List[float] = []
+    errors: Counter = Counter()
+    user_locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+    tasks = []
+
+    async def feed(record: dict, scheduled: float):
+        update = record["u"]
+        async with user_locks[update_user(update)]:
+            started = time.perf_counter()
+            lags.append(max(0.0, started - scheduled))
+            try:
+                await dp.feed_raw_update(bot, update)
+            except Exception as e:
+                errors[f"{type(e).__name__}: {e}"] += 1
+            timings[update_kind(update)].append(time.perf_counter() - started)
+
+    first_t = records[0]["t"]
+    started = time.perf_counter()
+    for record in records:
+        scheduled = started + ((record["t"] - first_t) / args.speed if args.speed else 0)
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(feed(record, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    await bot.session.close()
+    await api.stop()
+
+    all_timings = [t for values in timings.values() for t in values]
+    return {
+        "updates": len(records),
+        "recorded_seconds": round(records[-1]["t"] - first_t, 3),
+        "seconds": round(elapsed, 3),
+        "updates_per_second": round(len(records) / elapsed, 1) if elapsed else 0,
+        "p50_ms": round(percentile(all_timings, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(all_timings, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(all_timings, 0.99) * 1000, 2),
+        "lag_p95_ms": round(percentile(lags, 0.95) * 1000, 2),
+        "kinds": {
+            kind: {
+                "count": len(values),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+                "max_ms": round(max(values) * 1000, 2),
+            }
+            for kind, values in sorted(timings.items(), key=lambda item: -sum(item[1]))
+        },
+        "errors": dict(errors.most_common(10)),
+        "api_calls": dict(api.calls),
+    }
+
+
+def print_report(result: dict):
+    print(f"Обновлений: {result['updates']} (в записи {result['recorded_seconds']} с), "
+          f"воспроизведено за {result['seconds']} с — {result['updates_per_second']}/с")
+    print(f"Задержка обработки: p50 {result['p50_ms']} мс, p95 {result['p95_ms']} мс, p99 {result['p99_ms']} мс; "
+          f"отставание от расписания p95 {result['lag_p95_ms']} мс")
+    print()
+    print(f"{'тип':<28}{'кол-во':>8}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}{'max мс':>10}")
+    for kind, stats in result["kinds"].items():
+        print(f"{kind[:27]:<28}{stats['count']:>8}{stats['p50_ms']:>10}{stats['p95_ms']:>10}"
+              f"{stats['p99_ms']:>10}{stats['max_ms']:>10}")
+    if result["errors"]:
+        print("\nОшибки:")
+        for error, count in result["errors"].items():
+            print(f"  {count}× {error}")
+
+
+def main():
+    args = parse_args()
+    records = load_records(args.files, args.limit)
+    if not records:
+        sys.exit("В файлах нет обновлений")
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="replay-"), "bot.db")
+    copy_snapshot(args.db, db_path)
+
+    # Модули бота читают настройки при импорте — окружение задаётся до них
+    os.environ["DB_PATH"] = db_path
+    os.environ.setdefault("BOT_TOKEN", "123456:bench")
+    os.environ["RECORD_UPDATES"] = ""
+    os.environ["ADMIN_ID"] = "1"  # ADMIN_PSEUDONYM
+    # При ускорении антифлуд отбрасывал бы обновления, которые в записи прошли
+    os.environ.setdefault("THROTTLE_MESSAGE_RATE", "0")
+    os.environ.setdefault("THROTTLE_CALLBACK_RATE", "0")
+    logging.basicConfig(level=logging.ERROR, format="%(levelname)s - %(message)s")
+
+    if args.secret:
+        pseudonymize_snapshot(db_path, args.secret, args.admin_id)
+
+    result = asyncio.run(replay(args, records))
+    result["db"] = db_path
+    print_report(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
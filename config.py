@@ -5,4 +5,78 @@ load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 ADMIN_ID = int(os.getenv("ADMIN_ID", 0))
-DB_PATH = os.getenv("DB_PATH", "bot.db")
\ No newline at end of file
+DB_PATH = os.getenv("DB_PATH", "bot.db")
+
+# Архивация прошедших записей и слотов
+ARCHIVE_KEEP_DAYS = int(os.getenv("ARCHIVE_KEEP_DAYS", 1))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 500))
+
+# Рассылки: сообщений в секунду (лимит Telegram ~30/сек на бота) и размер пачки
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", 20))
+BROADCAST_BATCH_SIZE = int(os.getenv("BROADCAST_BATCH_SIZE", 200))
+
+# Импорт CSV: максимальный размер файла в байтах
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", 5 * 1024 * 1024))
+
+# Кэш идентификаторов пользователей (tg_id -> id, телефон, имя)
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", 10000))
+
+# Режим получения обновлений: polling (по умолчанию) или webhook
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")  # публичный адрес, например https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("WEB_PORT", 8080))
+
+# Количество процессов-воркеров (1 — обычный однопроцессный режим)
+WORKERS = int(os.getenv("WORKERS", 1))
+
+# Аренда лидерства для крон-задач при нескольких экземплярах бота (секунды)
+LEADER_LEASE_SECONDS = int(os.getenv("LEADER_LEASE_SECONDS", 60))
+
+# Метрики Prometheus (/metrics только на локальном интерфейсе; 0 — выключить)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9090))
+
+# Порог медленного запроса к SQLite (пишется в лог с EXPLAIN QUERY PLAN)
+SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", 100))
+
+# Запись входящих обновлений для воспроизведения (bench/replay.py); пусто — выключено
+RECORD_UPDATES = os.getenv("RECORD_UPDATES", "")
+# Ключ псевдонимизации id пользователей (без него псевдонимы меняются при перезапуске)
+RECORD_SECRET = os.getenv("RECORD_SECRET", "")
+
+# Профилировщик /profile: интервал сэмплирования и жёсткий лимит длительности
+PROFILE_INTERVAL_MS = int(os.getenv("PROFILE_INTERVAL_MS", 10))
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", 300))
+
+# Алерт админу, если цикл событий опаздывает дольше порога (не чаще раза в N секунд)
+HEALTH_LAG_ALERT_MS = int(os.getenv("HEALTH_LAG_ALERT_MS", 500))
+HEALTH_ALERT_COOLDOWN = int(os.getenv("HEALTH_ALERT_COOLDOWN", 300))
+
+# Сколько обновлений одного пользователя может ждать очереди (вместе с текущим); лишние отбрасываются
+USER_QUEUE_DEPTH = int(os.getenv("USER_QUEUE_DEPTH", 5))
+
+# Антифлуд: токенов в секунду и размер всплеска на пользователя (админ без ограничений); 0 — выключено
+THROTTLE_MESSAGE_RATE = float(os.getenv("THROTTLE_MESSAGE_RATE", 1))
+THROTTLE_MESSAGE_BURST = int(os.getenv("THROTTLE_MESSAGE_BURST", 5))
+THROTTLE_CALLBACK_RATE = float(os.getenv("THROTTLE_CALLBACK_RATE", 3))
+THROTTLE_CALLBACK_BURST = int(os.getenv("THROTTLE_CALLBACK_BURST", 10))
+
+# Задержка перерисовки списка услуг при выборе: частые нажатия склеиваются в одну правку
+EDIT_DEBOUNCE_MS = int(os.getenv("EDIT_DEBOUNCE_MS", 200))
+
+# Сколько секунд повтор того же нажатия (подтверждение, отмена записи) отвечается из кэша
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 30))
+
+# Планировщик обновлений: сколько обработчиков одновременно (0 — без ограничения)
+# и сколько обновлений может ждать; при переполнении отбрасываются наименее важные
+SCHEDULER_CONCURRENCY = int(os.getenv("SCHEDULER_CONCURRENCY", 20))
+SCHEDULER_QUEUE_SIZE = int(os.getenv("SCHEDULER_QUEUE_SIZE", 200))
+
+# Логи: уровень, формат (json — строка JSON с update_id и обработчиком, text — как раньше)
+# и прореживание болтливых модулей, например "reminders=0.1,aiogram.event=0.01"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
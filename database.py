@@ -1,10 +1,101 @@
+import sqlite3
+import time
 import aiosqlite
+from aiosqlite.context import contextmanager
 from config import DB_PATH
+from utils import metrics, querylog
+
+
+def _row_count(result) -> int:
+    """Сколько строк вернул fetchone/fetchmany/fetchall"""
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1 if isinstance(result, (tuple, sqlite3.Row)) else 0
+
+
+class InstrumentedCursor(aiosqlite.Cursor):
+    """Курсор, досчитывающий время и строки выборки к своему запросу"""
+
+    def __init__(self, conn: "InstrumentedConnection", cursor: sqlite3.Cursor, record: querylog.QueryRecord):
+        super().__init__(conn, cursor)
+        self._record = record
+
+    async def _execute(self, fn, *args, **kwargs):
+        started = time.perf_counter()
+        result = await super()._execute(fn, *args, **kwargs)
+        if self._record.add(time.perf_counter() - started, _row_count(result)):
+            await self._conn._log_slow(self._record)
+        return result
+
+
+class InstrumentedConnection(aiosqlite.Connection):
+    """Соединение aiosqlite с учётом времени, проведённого в SQLite
+
+    Все операции (execute, fetch*, commit...) проходят через _execute,
+    который ставит вызов в очередь потока соединения и ждёт результата.
+    execute/executemany дополнительно ведут статистику по запросам
+    (utils/querylog.py): время, число строк, обработчик.
+
+    Переопределяет внутренние методы aiosqlite, поэтому его версия
+    закреплена в requirements.txt.
+    """
+
+    async def _execute(self, fn, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super()._execute(fn, *args, **kwargs)
+        finally:
+            metrics.observe_db(time.perf_counter() - started)
+
+    async def _run_query(self, fn, sql: str, parameters, many: bool = False) -> InstrumentedCursor:
+        # План для executemany не строим: параметры могут быть одноразовым итератором
+        record = querylog.start(sql, None if many else parameters)
+        started = time.perf_counter()
+        cursor = await self._execute(fn, sql, parameters)
+        if record.add(time.perf_counter() - started, max(cursor.rowcount, 0)):
+            await self._log_slow(record)
+        return InstrumentedCursor(self, cursor, record)
+
+    @contextmanager
+    async def execute(self, sql: str, parameters=None) -> aiosqlite.Cursor:
+        return await self._run_query(self._conn.execute, sql, [] if parameters is None else parameters)
+
+    @contextmanager
+    async def executemany(self, sql: str, parameters) -> aiosqlite.Cursor:
+        return await self._run_query(self._conn.executemany, sql, parameters, many=True)
+
+    async def _log_slow(self, record: querylog.QueryRecord):
+        plan = None
+        if record.explainable and isinstance(record.params, (list, tuple, dict)):
+            try:
+                cursor = await self._execute(self._conn.execute, "EXPLAIN QUERY PLAN " + record.sql, record.params)
+                plan = [row[-1] for row in await self._execute(cursor.fetchall)]
+            except sqlite3.Error:
+                pass
+        querylog.log_slow(record, plan)
+
+
+def connect() -> aiosqlite.Connection:
+    """Соединение с БД бота (использовать как aiosqlite.connect: async with connect() as db)"""
+    return InstrumentedConnection(lambda: sqlite3.connect(DB_PATH), 64)
+
+
+def _phone_tokens_sql(column: str) -> str:
+    """SQL-выражение: цифры телефона целиком и последние 10 цифр через пробел"""
+    digits = f"COALESCE({column}, '')"
+    for ch in ("+", " ", "-", "(", ")", "."):
+        digits = f"REPLACE({digits}, '{ch}', '')"
+    return f"({digits} || ' ' || substr({digits}, -10))"
 
 
 async def db_init():
     """Инициализация базы данных и создание таблиц"""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
+        # WAL: чтение не блокируется записью, в том числе из других процессов
+        await db.execute("PRAGMA journal_mode=WAL")
+
         await db.execute("""
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -76,6 +167,160 @@ async def db_init():
         except Exception:
             pass
         
+        # Уникальность окон и названий услуг (для INSERT OR IGNORE при импорте)
+        try:
+            await db.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_timeslots_dt ON timeslots(dt)")
+            await db.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_services_name ON services(name COLLATE NOCASE)")
+            await db.commit()
+        except Exception as e:
+            print(f"⚠️ Не удалось создать уникальные индексы (есть дубликаты?): {e}")
+
+        # Одно окно — одна запись: повторное подтверждение не создаст вторую бронь.
+        # Раньше /free_slot освобождал окно, оставляя запись, — такие записи
+        # удаляем, иначе освобождённое окно нельзя забронировать снова
+        try:
+            await db.execute("""
+                DELETE FROM bookings
+                WHERE timeslot_id IN (SELECT id FROM timeslots WHERE COALESCE(is_booked, 0) = 0)
+            """)
+            await db.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_bookings_timeslot ON bookings(timeslot_id)")
+            await db.commit()
+        except Exception as e:
+            print(f"⚠️ Не удалось создать ux_bookings_timeslot (несколько записей на одно окно?): {e}")
+
+        # Пользователи, заблокировавшие бота (пропускаются в рассылках)
+        try:
+            await db.execute("ALTER TABLE users ADD COLUMN is_blocked INTEGER DEFAULT 0")
+            await db.commit()
+        except Exception:
+            pass
+
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_bookings_user ON bookings(user_id)")
+
+        # Полнотекстовый индекс клиентов: имя + телефон только цифрами
+        # (полный номер и последние 10 цифр, чтобы искать без кода страны)
+        await db.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+            name, phone,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3 4'
+        )""")
+
+        phone_new = _phone_tokens_sql("new.phone")
+        await db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+            INSERT INTO users_fts(rowid, name, phone) VALUES (new.id, new.name, {phone_new});
+        END""")
+        await db.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS users_fts_update AFTER UPDATE OF name, phone ON users BEGIN
+            UPDATE users_fts SET name = new.name, phone = {phone_new} WHERE rowid = new.id;
+        END""")
+        await db.execute("""
+        CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+            DELETE FROM users_fts WHERE rowid = old.id;
+        END""")
+
+        # Первичное заполнение индекса (или восстановление после рассинхрона)
+        cur = await db.execute("SELECT (SELECT COUNT(*) FROM users), (SELECT COUNT(*) FROM users_fts)")
+        users_count, fts_count = await cur.fetchone()
+        if users_count != fts_count:
+            await db.execute("DELETE FROM users_fts")
+            await db.execute(f"""
+                INSERT INTO users_fts(rowid, name, phone)
+                SELECT id, name, {_phone_tokens_sql("phone")} FROM users
+            """)
+            print(f"✅ Поисковый индекс клиентов перестроен ({users_count})")
+        await db.commit()
+
+        # Аренда лидерства: только держатель запускает крон-задачи
+        await db.execute("""
+        CREATE TABLE IF NOT EXISTS leader_lease (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )""")
+
+        # Рассылки и статус доставки по каждому получателю
+        await db.execute("""
+        CREATE TABLE IF NOT EXISTS broadcasts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            text TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'draft',
+            chat_id INTEGER,
+            message_id INTEGER,
+            created_at TEXT NOT NULL
+        )""")
+
+        await db.execute("""
+        CREATE TABLE IF NOT EXISTS broadcast_recipients (
+            broadcast_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            claimed_at REAL,
+            PRIMARY KEY (broadcast_id, user_id)
+        ) WITHOUT ROWID""")
+
+        # Время, когда получатель взят в отправку (status='sending')
+        try:
+            await db.execute("ALTER TABLE broadcast_recipients ADD COLUMN claimed_at REAL")
+            await db.commit()
+        except Exception:
+            pass
+
+        # Архив прошедших записей и слотов (холодные таблицы)
+        await db.execute("""
+        CREATE TABLE IF NOT EXISTS bookings_archive (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            timeslot_id INTEGER NOT NULL,
+            total_price INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            reminded24 INTEGER DEFAULT 0,
+            reminded12 INTEGER DEFAULT 0,
+            reminded1h INTEGER DEFAULT 0,
+            confirmed INTEGER DEFAULT 0,
+            archived_at TEXT NOT NULL
+        )""")
+
+        await db.execute("""
+        CREATE TABLE IF NOT EXISTS timeslots_archive (
+            id INTEGER PRIMARY KEY,
+            dt TEXT NOT NULL,
+            is_booked INTEGER DEFAULT 0,
+            booked_by_user_id INTEGER,
+            archived_at TEXT NOT NULL
+        )""")
+
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_bookings_archive_user ON bookings_archive(user_id)")
+        await db.execute("CREATE INDEX IF NOT EXISTS idx_timeslots_archive_dt ON timeslots_archive(dt)")
+
+        # Полная история (горячие + архив) для статистики и экспорта
+        await db.execute("""
+        CREATE VIEW IF NOT EXISTS bookings_all AS
+            SELECT id, user_id, timeslot_id, total_price, created_at,
+                   reminded24, reminded12, reminded1h, confirmed
+            FROM bookings
+            UNION ALL
+            SELECT id, user_id, timeslot_id, total_price, created_at,
+                   reminded24, reminded12, reminded1h, confirmed
+            FROM bookings_archive
+        """)
+
+        await db.execute("""
+        CREATE VIEW IF NOT EXISTS timeslots_all AS
+            SELECT id, dt, is_booked, booked_by_user_id FROM timeslots
+            UNION ALL
+            SELECT id, dt, is_booked, booked_by_user_id FROM timeslots_archive
+        """)
+        await db.commit()
+
+        # Инкрементальный VACUUM: включается один раз, требует полного VACUUM
+        cur = await db.execute("PRAGMA auto_vacuum")
+        if (await cur.fetchone())[0] != 2:
+            await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            await db.execute("VACUUM")
+            print("✅ Включён incremental auto_vacuum")
+
         # Обновляем существующие услуги - устанавливаем дефолтные 60 минут
         await db.execute("UPDATE services SET duration_minutes = 60 WHERE duration_minutes IS NULL OR duration_minutes = 0")
         await db.commit()
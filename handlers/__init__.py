@@ -1,11 +1,16 @@
 from aiogram import Dispatcher
-from . import user, booking, admin, reminders, contacts
+from . import menu, user, booking, admin, reminders, contacts, broadcast, csv_import, profiling
 
 
 def register_handlers(dp: Dispatcher):
     """Регистрация всех обработчиков"""
+    # Кнопки меню и текстовые триггеры (команды таблица пропускает)
+    dp.include_router(menu.router)
     dp.include_router(user.router)
     dp.include_router(booking.router)
     dp.include_router(admin.router)
     dp.include_router(reminders.router)
-    dp.include_router(contacts.router)
\ No newline at end of file
+    dp.include_router(contacts.router)
+    dp.include_router(broadcast.router)
+    dp.include_router(csv_import.router)
+    dp.include_router(profiling.router)
\ No newline at end of file
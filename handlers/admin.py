@@ -1,10 +1,15 @@
-import aiosqlite
+import tracemalloc
 from datetime import datetime, timedelta
 from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 
-from config import DB_PATH, ADMIN_ID
+from config import ADMIN_ID
+from database import connect
+from utils.archive import archive_past, incremental_vacuum
+from utils.search import search_clients
+from utils.heatmap import occupancy_grid, render_heatmap, top_cells
+from utils import health, querylog
 
 router = Router()
 
@@ -20,7 +25,8 @@ async def admin_menu(message: Message):
         "*Управление слотами:*\n"
         "• /addslot YYYY-MM-DD HH:MM — добавить окно\n"
         "• /generate\\_slots — генератор расписания\n"
-        "• /clear\\_old\\_slots — удалить старые слоты\n"
+        "• /import — загрузка окон и услуг из CSV\n"
+        "• /clear\\_old\\_slots — очистить/архивировать старые слоты\n"
         "• /slots — список окон\n"
         "• /del\\_slot <id> — удалить окно\n"
         "• /free\\_slot <id> — освободить окно\n\n"
@@ -31,8 +37,11 @@ async def admin_menu(message: Message):
         "• /set\\_duration <название> <минуты> — время\n\n"
         "*Записи и статистика:*\n"
         "• /bookings — все записи\n"
+        "• /find <имя или телефон> — поиск клиента\n"
         "• /export — экспорт в CSV\n"
-        "• /stats — статистика\n\n"
+        "• /stats — статистика\n"
+        "• /heatmap [с] [по] — загрузка по дням и часам\n"
+        "• /broadcast <текст> — рассылка всем клиентам\n\n"
         "*Информация:*\n"
         "• /set\\_contacts — настроить контакты",
         parse_mode="Markdown"
@@ -55,9 +64,12 @@ async def add_slot(message: Message):
     except ValueError:
         return await message.answer("Дата/время не распознаны. Пример: 2025-10-10 14:00")
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("INSERT INTO timeslots(dt) VALUES (?)", (dt.isoformat(),))
+    async with connect() as db:
+        # ux_timeslots_dt отсекает повторное окно на то же время атомарно
+        cur = await db.execute("INSERT OR IGNORE INTO timeslots(dt) VALUES (?)", (dt.isoformat(),))
         await db.commit()
+        if cur.rowcount == 0:
+            return await message.answer(f"Окно {dt.strftime('%d.%m %H:%M')} уже существует ❌")
 
     await message.answer(f"✅ Окно добавлено: {dt.strftime('%d.%m %H:%M')}")
 
@@ -146,7 +158,7 @@ async def generate_slots_time(call: CallbackQuery):
     start_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
     created_count = 0
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         for day_offset in range(days):
             current_date = start_date + timedelta(days=day_offset)
             
@@ -157,19 +169,12 @@ async def generate_slots_time(call: CallbackQuery):
             for hour in hours:
                 slot_time = current_date.replace(hour=hour, minute=0)
                 
-                # Проверяем, не существует ли уже такой слот
+                # Существующий слот пропускает ux_timeslots_dt
                 cur = await db.execute(
-                    "SELECT id FROM timeslots WHERE dt=?",
-                    (slot_time.isoformat(),)
-                )
-                if await cur.fetchone():
-                    continue
-                
-                await db.execute(
-                    "INSERT INTO timeslots(dt) VALUES (?)",
+                    "INSERT OR IGNORE INTO timeslots(dt) VALUES (?)",
                     (slot_time.isoformat(),)
                 )
-                created_count += 1
+                created_count += cur.rowcount
         
         await db.commit()
     
@@ -213,7 +218,7 @@ async def make_slots_custom(message: Message):
     start_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
     created_count = 0
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         for day_offset in range(days):
             current_date = start_date + timedelta(days=day_offset)
             
@@ -221,17 +226,10 @@ async def make_slots_custom(message: Message):
                 slot_time = current_date.replace(hour=hour, minute=minute)
                 
                 cur = await db.execute(
-                    "SELECT id FROM timeslots WHERE dt=?",
+                    "INSERT OR IGNORE INTO timeslots(dt) VALUES (?)",
                     (slot_time.isoformat(),)
                 )
-                if await cur.fetchone():
-                    continue
-                
-                await db.execute(
-                    "INSERT INTO timeslots(dt) VALUES (?)",
-                    (slot_time.isoformat(),)
-                )
-                created_count += 1
+                created_count += cur.rowcount
         
         await db.commit()
     
@@ -249,7 +247,7 @@ async def list_slots(message: Message):
     if message.from_user.id != ADMIN_ID:
         return await message.answer("Недостаточно прав.")
 
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cur = await db.execute(
             "SELECT id, dt, is_booked FROM timeslots ORDER BY dt LIMIT 30"
         )
@@ -276,7 +274,7 @@ async def delete_slot(message: Message):
         return await message.answer("Используй: /del_slot <id>")
 
     slot_id = parts[1]
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         await db.execute("DELETE FROM timeslots WHERE id=?", (slot_id,))
         await db.commit()
     await message.answer(f"✅ Окно #{slot_id} удалено")
@@ -293,13 +291,19 @@ async def free_slot(message: Message):
         return await message.answer("Используй: /free_slot <id>")
 
     slot_id = parts[1]
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
+        await db.execute("BEGIN IMMEDIATE")
         await db.execute(
             "UPDATE timeslots SET is_booked=0, booked_by_user_id=NULL WHERE id=?",
             (slot_id,)
         )
+        # Бронь на это окно удаляем вместе с ним: иначе ux_bookings_timeslot
+        # не даст записаться на освобождённое окно
+        cur = await db.execute("DELETE FROM bookings WHERE timeslot_id=?", (slot_id,))
+        removed = cur.rowcount
         await db.commit()
-    await message.answer(f"✅ Окно #{slot_id} теперь свободно")
+    note = "\nЗапись на это окно удалена." if removed else ""
+    await message.answer(f"✅ Окно #{slot_id} теперь свободно{note}")
 
 
 @router.message(Command("setprice"))
@@ -318,7 +322,7 @@ async def set_price(message: Message):
     except ValueError:
         return await message.answer("Цена должна быть числом")
 
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cur = await db.execute(
             "UPDATE services SET price=? WHERE LOWER(name)=LOWER(?)",
             (price, name)
@@ -337,7 +341,7 @@ async def list_bookings(message: Message):
     if message.from_user.id != ADMIN_ID:
         return await message.answer("Недостаточно прав.")
 
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cur = await db.execute("""
             SELECT b.id, t.dt, u.name, u.phone, b.total_price
             FROM bookings b
@@ -360,6 +364,38 @@ async def list_bookings(message: Message):
     await message.answer(text, parse_mode="Markdown")
 
 
+@router.message(Command("find"))
+async def find_client(message: Message):
+    """Поиск клиента по имени или телефону"""
+    if message.from_user.id != ADMIN_ID:
+        return await message.answer("Недостаточно прав.")
+
+    parts = message.text.strip().split(maxsplit=1)
+    if len(parts) < 2:
+        return await message.answer("Используй: /find <имя или телефон>\nНапример: /find Анна или /find 9001234")
+
+    clients = await search_clients(parts[1])
+    if not clients:
+        return await message.answer("Никого не нашлось 🤷")
+
+    now = datetime.now().isoformat()
+    text = ""
+    for client in clients:
+        upcoming = [b for b in client["bookings"] if b[1] >= now]
+        past = [b for b in client["bookings"] if b[1] < now]
+
+        text += f"👤 {client['name'] or 'без имени'} | {client['phone'] or 'нет телефона'}\n"
+        for bid, dt_str, price in reversed(upcoming):
+            text += f"  ⏭ {datetime.fromisoformat(dt_str).strftime('%d.%m.%Y %H:%M')} — {price} ₽ (#{bid})\n"
+        if past:
+            last_dt = datetime.fromisoformat(past[0][1]).strftime('%d.%m.%Y')
+            text += f"  ✔️ Визитов: {len(past)}, последний: {last_dt}\n"
+        text += "\n"
+
+    # Без Markdown: имена клиентов могут содержать служебные символы
+    await message.answer(text)
+
+
 @router.message(Command("addservice"))
 async def add_service(message: Message):
     """Добавить новую услугу"""
@@ -376,14 +412,12 @@ async def add_service(message: Message):
     except ValueError:
         return await message.answer("Цена должна быть числом")
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        cur = await db.execute("SELECT id FROM services WHERE LOWER(name)=LOWER(?)", (name,))
-        row = await cur.fetchone()
-        if row:
-            return await message.answer(f"Услуга '{name}' уже существует ❌")
-
-        await db.execute("INSERT INTO services(name, price) VALUES (?, ?)", (name, price))
+    async with connect() as db:
+        # ux_services_name (без учёта регистра) отсекает дубликаты атомарно
+        cur = await db.execute("INSERT OR IGNORE INTO services(name, price) VALUES (?, ?)", (name, price))
         await db.commit()
+        if cur.rowcount == 0:
+            return await message.answer(f"Услуга '{name}' уже существует ❌")
 
     await message.answer(f"✅ Услуга '{name}' добавлена. Цена: {price} ₽")
 
@@ -400,7 +434,7 @@ async def delete_service(message: Message):
 
     name = parts[1]
 
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cur = await db.execute("DELETE FROM services WHERE LOWER(name)=LOWER(?)", (name,))
         await db.commit()
 
@@ -421,6 +455,7 @@ async def show_statistics(message: Message):
         [InlineKeyboardButton(text="💰 Финансы", callback_data="stats_finance")],
         [InlineKeyboardButton(text="🔥 Популярные услуги", callback_data="stats_services")],
         [InlineKeyboardButton(text="📅 По дням недели", callback_data="stats_weekdays")],
+        [InlineKeyboardButton(text="🗓 Загрузка по часам", callback_data="stats_heatmap")],
         [InlineKeyboardButton(text="👥 Клиенты", callback_data="stats_clients")],
     ])
     
@@ -435,15 +470,15 @@ async def show_statistics(message: Message):
 @router.callback_query(F.data == "stats_general")
 async def stats_general(call: CallbackQuery):
     """Общая статистика"""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         # Всего записей
-        cur = await db.execute("SELECT COUNT(*) FROM bookings")
+        cur = await db.execute("SELECT COUNT(*) FROM bookings_all")
         total_bookings = (await cur.fetchone())[0]
         
         # Записи за последние 30 дней
         thirty_days_ago = (datetime.now() - timedelta(days=30)).isoformat()
         cur = await db.execute(
-            "SELECT COUNT(*) FROM bookings WHERE created_at >= ?",
+            "SELECT COUNT(*) FROM bookings_all WHERE created_at >= ?",
             (thirty_days_ago,)
         )
         bookings_30d = (await cur.fetchone())[0]
@@ -485,15 +520,15 @@ async def stats_general(call: CallbackQuery):
 @router.callback_query(F.data == "stats_finance")
 async def stats_finance(call: CallbackQuery):
     """Финансовая статистика"""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         # Общая выручка
-        cur = await db.execute("SELECT SUM(total_price) FROM bookings")
+        cur = await db.execute("SELECT SUM(total_price) FROM bookings_all")
         total_revenue = (await cur.fetchone())[0] or 0
         
         # Выручка за 30 дней
         thirty_days_ago = (datetime.now() - timedelta(days=30)).isoformat()
         cur = await db.execute(
-            "SELECT SUM(total_price) FROM bookings WHERE created_at >= ?",
+            "SELECT SUM(total_price) FROM bookings_all WHERE created_at >= ?",
             (thirty_days_ago,)
         )
         revenue_30d = (await cur.fetchone())[0] or 0
@@ -501,13 +536,13 @@ async def stats_finance(call: CallbackQuery):
         # Выручка за 7 дней
         seven_days_ago = (datetime.now() - timedelta(days=7)).isoformat()
         cur = await db.execute(
-            "SELECT SUM(total_price) FROM bookings WHERE created_at >= ?",
+            "SELECT SUM(total_price) FROM bookings_all WHERE created_at >= ?",
             (seven_days_ago,)
         )
         revenue_7d = (await cur.fetchone())[0] or 0
         
         # Средний чек
-        cur = await db.execute("SELECT AVG(total_price) FROM bookings")
+        cur = await db.execute("SELECT AVG(total_price) FROM bookings_all")
         avg_check = (await cur.fetchone())[0] or 0
         
         # Предстоящая выручка
@@ -539,7 +574,7 @@ async def stats_finance(call: CallbackQuery):
 @router.callback_query(F.data == "stats_services")
 async def stats_services(call: CallbackQuery):
     """Статистика по услугам"""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         # Это требует связи многие-ко-многим между bookings и services
         # Для простоты используем существующую структуру
         cur = await db.execute("""
@@ -572,14 +607,14 @@ async def stats_services(call: CallbackQuery):
 @router.callback_query(F.data == "stats_weekdays")
 async def stats_weekdays(call: CallbackQuery):
     """Статистика по дням недели"""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cur = await db.execute("""
             SELECT 
                 CAST(strftime('%w', t.dt) AS INTEGER) as dow,
                 COUNT(*) as cnt,
                 SUM(b.total_price) as revenue
-            FROM bookings b
-            JOIN timeslots t ON t.id = b.timeslot_id
+            FROM bookings_all b
+            JOIN timeslots_all t ON t.id = b.timeslot_id
             GROUP BY dow
             ORDER BY dow
         """)
@@ -612,14 +647,63 @@ async def stats_weekdays(call: CallbackQuery):
     await call.answer()
 
 
+async def _heatmap_text(date_from, date_to) -> str:
+    """Текст тепловой карты загрузки за период"""
+    grid = await occupancy_grid(date_from, date_to)
+    grid_text = render_heatmap(grid)
+
+    text = (
+        f"🗓 *Загрузка по дням и часам*\n"
+        f"{date_from.strftime('%d.%m.%Y')} — {date_to.strftime('%d.%m.%Y')}\n\n"
+    )
+    if not grid_text:
+        return text + "Пока нет данных"
+
+    text += f"```\n{grid_text}\n```\n*Заполняются первыми:*\n"
+    for day_name, hour, ratio in top_cells(grid):
+        text += f"• {day_name} {hour:02d}:00 — {ratio:.0%}\n"
+    return text
+
+
+@router.message(Command("heatmap"))
+async def heatmap(message: Message):
+    """Тепловая карта загрузки: /heatmap [YYYY-MM-DD] [YYYY-MM-DD]"""
+    if message.from_user.id != ADMIN_ID:
+        return await message.answer("Недостаточно прав.")
+
+    parts = message.text.strip().split()
+    today = datetime.now().date()
+    try:
+        date_from = datetime.strptime(parts[1], "%Y-%m-%d").date() if len(parts) > 1 else today - timedelta(days=90)
+        date_to = datetime.strptime(parts[2], "%Y-%m-%d").date() if len(parts) > 2 else today + timedelta(days=30)
+    except ValueError:
+        return await message.answer("Используй: /heatmap 2025-01-01 2025-04-01")
+
+    await message.answer(await _heatmap_text(date_from, date_to), parse_mode="Markdown")
+
+
+@router.callback_query(F.data == "stats_heatmap")
+async def stats_heatmap(call: CallbackQuery):
+    """Тепловая карта за последние 90 дней и ближайший месяц"""
+    today = datetime.now().date()
+    text = await _heatmap_text(today - timedelta(days=90), today + timedelta(days=30))
+    
+    kb = InlineKeyboardMarkup(inline_keyboard=[[
+        InlineKeyboardButton(text="⬅️ Назад", callback_data="stats_back")
+    ]])
+    
+    await call.message.edit_text(text, parse_mode="Markdown", reply_markup=kb)
+    await call.answer()
+
+
 @router.callback_query(F.data == "stats_clients")
 async def stats_clients(call: CallbackQuery):
     """Статистика по клиентам"""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         # ТОП клиентов по количеству записей
         cur = await db.execute("""
             SELECT u.name, COUNT(*) as visits, SUM(b.total_price) as spent
-            FROM bookings b
+            FROM bookings_all b
             JOIN users u ON u.id = b.user_id
             GROUP BY u.id
             ORDER BY visits DESC
@@ -651,6 +735,7 @@ async def stats_back(call: CallbackQuery):
         [InlineKeyboardButton(text="💰 Финансы", callback_data="stats_finance")],
         [InlineKeyboardButton(text="🔥 Популярные услуги", callback_data="stats_services")],
         [InlineKeyboardButton(text="📅 По дням недели", callback_data="stats_weekdays")],
+        [InlineKeyboardButton(text="🗓 Загрузка по часам", callback_data="stats_heatmap")],
         [InlineKeyboardButton(text="👥 Клиенты", callback_data="stats_clients")],
     ])
     
@@ -676,7 +761,7 @@ async def debug_slots(message: Message):
     
     date_str = parts[1]
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cur = await db.execute(
             """SELECT id, dt, is_booked FROM timeslots 
                WHERE date(dt)=? 
@@ -696,6 +781,74 @@ async def debug_slots(message: Message):
     await message.answer(text, parse_mode="Markdown")
 
 
+@router.message(Command("debug_queries"))
+async def debug_queries(message: Message):
+    """Самые дорогие запросы к БД по суммарному времени (только админ)"""
+    if message.from_user.id != ADMIN_ID:
+        return await message.answer("Недостаточно прав.")
+
+    parts = message.text.strip().split()
+    if len(parts) > 1 and parts[1] == "reset":
+        querylog.reset()
+        return await message.answer("✅ Статистика запросов сброшена")
+
+    limit = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 10
+    stats = querylog.top(limit)
+    if not stats:
+        return await message.answer("Запросов пока не было.")
+
+    text = "🐢 Запросы по суммарному времени:\n\n"
+    for i, (sql, stat) in enumerate(stats, 1):
+        handlers = sorted(stat.handlers.items(), key=lambda item: item[1], reverse=True)[:3]
+        text += (
+            f"{i}. {stat.seconds * 1000:.1f} мс | {stat.count}× | "
+            f"ср. {stat.seconds * 1000 / stat.count:.2f} мс | макс {stat.max_seconds * 1000:.1f} мс | "
+            f"строк {stat.rows}\n"
+            f"   {', '.join(f'{name}×{count}' for name, count in handlers)}\n"
+            f"   {sql[:300]}\n\n"
+        )
+    text += "/debug_queries reset — сбросить"
+
+    # Без Markdown: в тексте запросов есть * и _
+    await message.answer(text[:4000])
+
+
+@router.message(Command("debug_health"))
+async def debug_health(message: Message):
+    """Состояние процесса: цикл событий, задачи, память, кэши (только админ)"""
+    if message.from_user.id != ADMIN_ID:
+        return await message.answer("Недостаточно прав.")
+
+    parts = message.text.strip().split()
+    if len(parts) > 1 and parts[1] == "mem":
+        if len(parts) > 2 and parts[2] == "stop":
+            health.stop_tracemalloc()
+            return await message.answer("✅ tracemalloc остановлен")
+        if not tracemalloc.is_tracing():
+            health.start_tracemalloc()
+            return await message.answer(
+                "🧠 tracemalloc запущен (замедляет работу). Повтори /debug_health mem "
+                "через пару минут, чтобы увидеть топ аллокаций; /debug_health mem stop — выключить."
+            )
+        top = health.top_allocations()
+        return await message.answer("🧠 Топ аллокаций с момента запуска tracemalloc:\n\n" + "\n".join(top))
+
+    snapshot = health.snapshot()
+    text = (
+        f"🩺 Состояние бота\n\n"
+        f"Готов: {'да' if snapshot['ready'] else 'нет'}, работает {snapshot['uptime_s'] // 60} мин\n"
+        f"Задержка цикла: {snapshot['loop_lag_ms']} мс (макс. за минуту {snapshot['loop_lag_max_ms']} мс)\n"
+        f"Задач asyncio: {snapshot['tasks']}\n"
+        f"Память (RSS): {snapshot['rss_mb']} МБ\n"
+        f"tracemalloc: {'включён' if snapshot['tracemalloc'] else 'выключен'}\n\n"
+        f"Кэши и состояние:\n"
+    )
+    text += "\n".join(f"• {name}: {size}" for name, size in sorted(snapshot["sizes"].items()))
+    text += "\n\n/debug_health mem — топ аллокаций (tracemalloc)"
+
+    await message.answer(text)
+
+
 # ===== ЭКСПОРТ ДАННЫХ =====
 
 @router.message(Command("export"))
@@ -704,7 +857,7 @@ async def export_bookings(message: Message):
     if message.from_user.id != ADMIN_ID:
         return await message.answer("Недостаточно прав.")
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cur = await db.execute("""
             SELECT 
                 b.id,
@@ -714,8 +867,8 @@ async def export_bookings(message: Message):
                 b.total_price,
                 b.created_at,
                 COALESCE(b.confirmed, 0) as confirmed
-            FROM bookings b
-            JOIN timeslots t ON t.id = b.timeslot_id
+            FROM bookings_all b
+            JOIN timeslots_all t ON t.id = b.timeslot_id
             JOIN users u ON u.id = b.user_id
             ORDER BY t.dt DESC
         """)
@@ -761,14 +914,15 @@ async def clear_old_slots(message: Message):
     
     kb = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text="🗑 Удалить старые свободные", callback_data="clear_old_free")],
-        [InlineKeyboardButton(text="🗑 Удалить ВСЕ старые", callback_data="clear_old_all")],
+        [InlineKeyboardButton(text="📦 Архивировать ВСЕ старые", callback_data="clear_old_all")],
         [InlineKeyboardButton(text="❌ Отмена", callback_data="cancel_clear")],
     ])
     
     await message.answer(
         "Какие старые слоты удалить?\n\n"
         "• *Свободные* - только пустые слоты\n"
-        "• *Все* - включая с завершёнными записями",
+        "• *Все* - переносятся в архив вместе с завершёнными записями "
+        "(история остаётся в статистике и экспорте)",
         parse_mode="Markdown",
         reply_markup=kb
     )
@@ -779,7 +933,7 @@ async def clear_old_free_slots(call: CallbackQuery):
     """Удалить старые свободные слоты"""
     now = datetime.now().isoformat()
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cur = await db.execute(
             "DELETE FROM timeslots WHERE dt < ? AND is_booked = 0",
             (now,)
@@ -787,35 +941,21 @@ async def clear_old_free_slots(call: CallbackQuery):
         deleted = cur.rowcount
         await db.commit()
     
+    await incremental_vacuum()
+    
     await call.message.edit_text(f"✅ Удалено старых свободных слотов: {deleted}")
     await call.answer()
 
 
 @router.callback_query(F.data == "clear_old_all")
 async def clear_old_all_slots(call: CallbackQuery):
-    """Удалить ВСЕ старые слоты"""
-    now = datetime.now().isoformat()
-    
-    async with aiosqlite.connect(DB_PATH) as db:
-        # Удаляем старые записи
-        cur = await db.execute("""
-            DELETE FROM bookings 
-            WHERE timeslot_id IN (
-                SELECT id FROM timeslots WHERE dt < ?
-            )
-        """, (now,))
-        deleted_bookings = cur.rowcount
-        
-        # Удаляем старые слоты
-        cur = await db.execute("DELETE FROM timeslots WHERE dt < ?", (now,))
-        deleted_slots = cur.rowcount
-        
-        await db.commit()
+    """Перенести ВСЕ старые слоты и записи в архив"""
+    moved_bookings, moved_slots = await archive_past(keep_days=0)
     
     await call.message.edit_text(
-        f"✅ Очищено:\n"
-        f"• Записей: {deleted_bookings}\n"
-        f"• Слотов: {deleted_slots}"
+        f"✅ Перенесено в архив:\n"
+        f"• Записей: {moved_bookings}\n"
+        f"• Слотов: {moved_slots}"
     )
     await call.answer()
 
@@ -845,7 +985,7 @@ async def set_duration(message: Message):
     except ValueError:
         return await message.answer("Длительность должна быть числом")
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cur = await db.execute(
             "UPDATE services SET duration_minutes=? WHERE LOWER(name)=LOWER(?)",
             (duration, name)
@@ -875,16 +1015,14 @@ async def add_service(message: Message):
     except ValueError:
         return await message.answer("Цена и длительность должны быть числами")
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        cur = await db.execute("SELECT id FROM services WHERE LOWER(name)=LOWER(?)", (name,))
-        row = await cur.fetchone()
-        if row:
-            return await message.answer(f"Услуга '{name}' уже существует ❌")
-
-        await db.execute(
-            "INSERT INTO services(name, price, duration_minutes) VALUES (?, ?, ?)", 
+    async with connect() as db:
+        # ux_services_name (без учёта регистра) отсекает дубликаты атомарно
+        cur = await db.execute(
+            "INSERT OR IGNORE INTO services(name, price, duration_minutes) VALUES (?, ?, ?)",
             (name, price, duration)
         )
         await db.commit()
+        if cur.rowcount == 0:
+            return await message.answer(f"Услуга '{name}' уже существует ❌")
 
     await message.answer(f"✅ Услуга '{name}' добавлена\n💰 Цена: {price} ₽\n⏱ Длительность: {duration} мин")
\ No newline at end of file
@@ -1,5 +1,5 @@
 import logging
-import aiosqlite
+import sqlite3
 from datetime import datetime, timedelta
 from typing import Dict, Set, List
 from aiogram import Router, F, Bot
@@ -13,27 +13,39 @@ from aiogram.types import (
     InlineKeyboardButton,
 )
 
-from config import DB_PATH, ADMIN_ID
+from config import ADMIN_ID, EDIT_DEBOUNCE_MS
+from database import connect
 from keyboards.main_menu import main_menu_kb
 from keyboards.services import render_services_keyboard
 from utils.calendar import build_calendar
+from utils.identity import get_identity, ensure_user
+from utils.health import register_size
+from utils.coalesce import EditCoalescer
+from utils.idempotency import idempotent, retryable
+from utils.fanout import fanout
 
 router = Router()
 
 # Память для выбора услуг до подтверждения
 pending: Dict[int, dict] = {}
+register_size("booking_pending", lambda: len(pending))
+
+# Перерисовки списка услуг: (chat_id, message_id) -> последняя отрисовка
+service_edits = EditCoalescer(EDIT_DEBOUNCE_MS / 1000)
+register_size("booking_service_edits", lambda: len(service_edits))
+
+
+def _message_key(message: Message) -> tuple:
+    return message.chat.id, message.message_id
 
 
 @router.message(Command("book"))
-@router.message(F.text.startswith("📅"))
 async def start_booking(message: Message):
     """Начало процесса записи - СНАЧАЛА выбор услуг"""
     # Проверим, есть ли телефон у пользователя
-    async with aiosqlite.connect(DB_PATH) as db:
-        cur = await db.execute("SELECT phone FROM users WHERE tg_id=?", (message.from_user.id,))
-        row = await cur.fetchone()
+    identity = await get_identity(message.from_user.id)
 
-    if not row or not row[0]:
+    if not identity or not identity.phone:
         kb = ReplyKeyboardMarkup(
             keyboard=[[KeyboardButton(text="📱 Отправить номер", request_contact=True)]],
             resize_keyboard=True
@@ -65,8 +77,16 @@ async def toggle_service(call: CallbackQuery):
     else:
         selected.add(svc_id)
 
-    text, kb, _, _ = await render_services_keyboard(selected)
-    await call.message.edit_text(text, parse_mode="Markdown", reply_markup=kb)
+    # Выбор меняется сразу, а сообщение перерисовывается с задержкой —
+    # несколько быстрых нажатий дают одну правку с последним состоянием
+    snapshot = set(selected)
+    message = call.message
+
+    async def render():
+        text, kb, _, _ = await render_services_keyboard(snapshot)
+        await message.edit_text(text, parse_mode="Markdown", reply_markup=kb)
+
+    service_edits.schedule(_message_key(message), render)
     await call.answer()
 
 
@@ -85,8 +105,11 @@ async def finalize_services(call: CallbackQuery):
         await call.answer("Выбери хотя бы одну услугу 🙏", show_alert=True)
         return
 
+    # Отложенная перерисовка услуг не должна затереть календарь
+    await service_edits.cancel(_message_key(call.message))
+
     # Получаем информацию об услугах
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         q_marks = ",".join("?" * len(selected))
         cur = await db.execute(
             f"SELECT name, price, duration_minutes FROM services WHERE id IN ({q_marks})",
@@ -127,7 +150,7 @@ async def find_available_slots_for_duration(date_obj, duration_minutes: int) ->
     Returns:
         List of (start_slot_id, start_dt, slot_ids_needed)
     """
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         # Получаем ВСЕ слоты на эту дату отсортированные по времени
         cur = await db.execute(
             """SELECT id, dt, is_booked FROM timeslots 
@@ -272,7 +295,7 @@ async def confirm_slot_range(call: CallbackQuery):
     state["slot_ids"] = slot_ids
     
     # Получаем время для отображения
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cur = await db.execute("SELECT dt FROM timeslots WHERE id=?", (start_slot_id,))
         row = await cur.fetchone()
         start_dt = datetime.fromisoformat(row[0])
@@ -302,6 +325,7 @@ async def confirm_slot_range(call: CallbackQuery):
 
 
 @router.callback_query(F.data == "confirm_booking")
+@idempotent
 async def confirm_booking(call: CallbackQuery):
     """Подтверждение и создание записи"""
     user_id = call.from_user.id
@@ -314,18 +338,10 @@ async def confirm_booking(call: CallbackQuery):
     slot_ids = state["slot_ids"]
     total_price = state["total_price"]
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        # Получить/создать пользователя
-        cur = await db.execute("SELECT id FROM users WHERE tg_id=?", (user_id,))
-        row = await cur.fetchone()
-        if row:
-            uid = row[0]
-        else:
-            await db.execute("INSERT INTO users(tg_id) VALUES (?)", (user_id,))
-            await db.commit()
-            cur = await db.execute("SELECT id FROM users WHERE tg_id=?", (user_id,))
-            uid = (await cur.fetchone())[0]
-
+    # Получить/создать пользователя
+    uid = (await ensure_user(user_id, call.from_user.full_name or "")).id
+    
+    async with connect() as db:
         # 🔒 АТОМАРНАЯ ПРОВЕРКА И БРОНИРОВАНИЕ ВСЕХ СЛОТОВ
         try:
             await db.execute("BEGIN IMMEDIATE")
@@ -340,6 +356,7 @@ async def confirm_booking(call: CallbackQuery):
             
             if len(slots) != len(slot_ids):
                 await db.rollback()
+                retryable()
                 await call.answer("Некоторые слоты не найдены 😕", show_alert=True)
                 return
             
@@ -347,6 +364,7 @@ async def confirm_booking(call: CallbackQuery):
             for slot_id, dt_str, is_booked in slots:
                 if is_booked:
                     await db.rollback()
+                    retryable()
                     await call.answer(
                         "😔 К сожалению, один из слотов уже занят.\n"
                         "Попробуй выбрать другое время.",
@@ -373,9 +391,16 @@ async def confirm_booking(call: CallbackQuery):
             # Получаем время для сообщения
             first_dt_str = slots[0][1]
             
+        except sqlite3.IntegrityError:
+            # ux_bookings_timeslot: на это окно бронь уже есть
+            await db.rollback()
+            retryable()
+            await call.answer("😔 Это время уже занято. Выбери другое.", show_alert=True)
+            return
         except Exception as e:
             await db.rollback()
-            logging.error(f"Booking error: {e}")
+            logging.error("Booking error: %s", e)
+            retryable()
             await call.answer("❌ Ошибка при бронировании. Попробуй ещё раз.", show_alert=True)
             return
 
@@ -384,21 +409,20 @@ async def confirm_booking(call: CallbackQuery):
     start_dt = datetime.fromisoformat(first_dt_str)
     end_dt = start_dt + timedelta(minutes=state["total_minutes"])
     when = f"{start_dt.strftime('%d.%m %H:%M')} - {end_dt.strftime('%H:%M')}"
-    
-    await call.message.edit_text(
-        f"✅ *Отлично!*\n\n"
-        f"Ты записан(а) на:\n"
-        f"📅 {start_dt.strftime('%d.%m.%Y')}\n"
-        f"⏰ {when}\n"
-        f"💰 {total_price} ₽\n\n"
-        f"Жду тебя! 💅",
-        parse_mode="Markdown"
-    )
+    services_list = "\n".join([f"• {name}" for name, _, _ in state["services_data"]])
 
-    # Уведомить мастера
-    try:
-        services_list = "\n".join([f"• {name}" for name, _, _ in state["services_data"]])
-        await call.bot.send_message(
+    # Сообщение клиенту, уведомление мастеру и ответ на нажатие — одновременно
+    await fanout(
+        call.message.edit_text(
+            f"✅ *Отлично!*\n\n"
+            f"Ты записан(а) на:\n"
+            f"📅 {start_dt.strftime('%d.%m.%Y')}\n"
+            f"⏰ {when}\n"
+            f"💰 {total_price} ₽\n\n"
+            f"Жду тебя! 💅",
+            parse_mode="Markdown"
+        ),
+        call.bot.send_message(
             ADMIN_ID,
             f"🆕 *Новая запись!*\n\n"
             f"👤 {call.from_user.full_name}\n"
@@ -407,26 +431,23 @@ async def confirm_booking(call: CallbackQuery):
             f"Услуги:\n{services_list}\n\n"
             f"💰 {total_price} ₽",
             parse_mode="Markdown"
-        )
-    except Exception as e:
-        logging.warning(f"Cannot notify admin: {e}")
-
-    await call.answer("✅ Запись создана!")
+        ),
+        call.answer("✅ Запись создана!"),
+        label="confirm_booking",
+    )
 
 
 @router.message(Command("my"))
-@router.message(F.text.startswith("👀"))
 async def my_bookings(message: Message):
     """Показать мои записи"""
     user_id = message.from_user.id
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        cur = await db.execute("SELECT id FROM users WHERE tg_id=?", (user_id,))
-        row = await cur.fetchone()
-        if not row:
-            return await message.answer("Пока записей нет.")
+    identity = await get_identity(user_id)
+    if not identity:
+        return await message.answer("Пока записей нет.")
 
-        uid = row[0]
+    uid = identity.id
+    async with connect() as db:
         cur = await db.execute("""
             SELECT b.id, t.dt, b.total_price
             FROM bookings b
@@ -452,11 +473,17 @@ async def my_bookings(message: Message):
 
 
 @router.callback_query(F.data.startswith("cancel_booking:"))
+@idempotent
 async def cancel_booking(call: CallbackQuery):
     """Отмена записи - освобождаем ВСЕ связанные слоты"""
     booking_id = int(call.data.split(":")[1])
 
-    async with aiosqlite.connect(DB_PATH) as db:
+    identity = await get_identity(call.from_user.id)
+    if not identity:
+        return await call.answer("Пользователь не найден", show_alert=True)
+    user_db_id = identity.id
+
+    async with connect() as db:
         try:
             await db.execute("BEGIN IMMEDIATE")
             
@@ -468,17 +495,6 @@ async def cancel_booking(call: CallbackQuery):
                 return await call.answer("Запись не найдена ❌", show_alert=True)
             main_slot_id = row[0]
             
-            # Находим все слоты этого пользователя, связанные с этой записью
-            # (все подряд идущие слоты от начала записи)
-            cur = await db.execute("""
-                SELECT u.id FROM users WHERE tg_id=?
-            """, (call.from_user.id,))
-            user_row = await cur.fetchone()
-            if not user_row:
-                await db.rollback()
-                return await call.answer("Пользователь не найден", show_alert=True)
-            user_db_id = user_row[0]
-            
             # Получаем время основного слота
             cur = await db.execute("SELECT dt FROM timeslots WHERE id=?", (main_slot_id,))
             main_dt_str = (await cur.fetchone())[0]
@@ -518,20 +534,19 @@ async def cancel_booking(call: CallbackQuery):
             
         except Exception as e:
             await db.rollback()
-            logging.error(f"Cancel booking error: {e}")
+            logging.error("Cancel booking error: %s", e)
+            retryable()
             return await call.answer("Ошибка отмены", show_alert=True)
 
-    await call.message.edit_text("✅ Запись успешно отменена!")
-    await call.answer()
-
-    # Уведомить мастера
-    try:
-        await call.bot.send_message(
+    await fanout(
+        call.message.edit_text("✅ Запись успешно отменена!"),
+        call.answer(),
+        call.bot.send_message(
             ADMIN_ID,
             f"❌ Пользователь {call.from_user.full_name} отменил запись #{booking_id}"
-        )
-    except Exception as e:
-        logging.warning(f"Cannot notify admin: {e}")
+        ),
+        label="cancel_booking",
+    )
 
 
 @router.callback_query(F.data.startswith("reschedule:"))
@@ -552,6 +567,7 @@ async def reschedule_booking(call: CallbackQuery):
 async def cancel_flow(call: CallbackQuery):
     """Отмена процесса бронирования"""
     pending.pop(call.from_user.id, None)
+    await service_edits.cancel(_message_key(call.message))
     await call.message.edit_text("Запись отменена. Можешь начать заново: /book")
     await call.answer()
 
@@ -0,0 +1,291 @@
+import asyncio
+import logging
+import time
+import aiosqlite
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from aiogram import Router, F, Bot
+from aiogram.filters import Command
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter, TelegramBadRequest
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+
+from config import ADMIN_ID, BROADCAST_RATE, BROADCAST_BATCH_SIZE
+from database import connect
+from utils.ratelimit import TokenBucket
+from utils.health import register_size
+
+router = Router()
+
+# Запущенные рассылки: broadcast_id -> задача
+_running: Dict[int, asyncio.Task] = {}
+register_size("broadcasts_running", lambda: len(_running))
+
+# Как часто обновлять сообщение с прогрессом (секунды)
+PROGRESS_INTERVAL = 3
+
+# Через сколько секунд пачку в 'sending' считать брошенной (запуск упал).
+# С запасом больше времени отправки пачки: BROADCAST_BATCH_SIZE / BROADCAST_RATE
+CLAIM_TIMEOUT = 600
+
+
+@router.message(Command("broadcast"))
+async def broadcast_start(message: Message):
+    """Создать рассылку всем клиентам (только админ)"""
+    if message.from_user.id != ADMIN_ID:
+        return await message.answer("Недостаточно прав.")
+
+    parts = message.text.strip().split(maxsplit=1)
+    if len(parts) < 2:
+        return await message.answer(
+            "Используй: /broadcast <текст сообщения>\n\n"
+            "Сообщение получат все клиенты, кроме заблокировавших бота."
+        )
+
+    text = parts[1]
+
+    async with connect() as db:
+        cur = await db.execute(
+            "INSERT INTO broadcasts(text, status, created_at) VALUES (?, 'draft', ?)",
+            (text, datetime.now().isoformat(timespec="seconds"))
+        )
+        broadcast_id = cur.lastrowid
+        await db.commit()
+
+        cur = await db.execute("SELECT COUNT(*) FROM users WHERE COALESCE(is_blocked, 0) = 0")
+        total = (await cur.fetchone())[0]
+
+    kb = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=f"📨 Отправить ({total})", callback_data=f"bc_send:{broadcast_id}")],
+        [InlineKeyboardButton(text="❌ Отмена", callback_data=f"bc_cancel:{broadcast_id}")],
+    ])
+
+    await message.answer(
+        f"📢 Рассылка #{broadcast_id}\n\n{text}\n\nПолучателей: {total}",
+        reply_markup=kb
+    )
+
+
+@router.callback_query(F.data.startswith("bc_send:"))
+async def broadcast_send(call: CallbackQuery):
+    """Запуск рассылки"""
+    if call.from_user.id != ADMIN_ID:
+        return await call.answer("Недостаточно прав.", show_alert=True)
+
+    broadcast_id = int(call.data.split(":")[1])
+
+    async with connect() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        cur = await db.execute(
+            "UPDATE broadcasts SET status='running', chat_id=?, message_id=? WHERE id=? AND status='draft'",
+            (call.message.chat.id, call.message.message_id, broadcast_id)
+        )
+        if cur.rowcount == 0:
+            await db.rollback()
+            return await call.answer("Рассылка уже запущена или отменена")
+
+        # Фиксируем список получателей — по нему рассылка продолжится после рестарта
+        await db.execute("""
+            INSERT OR IGNORE INTO broadcast_recipients(broadcast_id, user_id)
+            SELECT ?, id FROM users WHERE COALESCE(is_blocked, 0) = 0
+        """, (broadcast_id,))
+        await db.commit()
+
+    await call.answer("🚀 Рассылка запущена")
+    _spawn(call.bot, broadcast_id)
+
+
+@router.callback_query(F.data.startswith("bc_cancel:"))
+async def broadcast_cancel(call: CallbackQuery):
+    """Отмена черновика рассылки"""
+    if call.from_user.id != ADMIN_ID:
+        return await call.answer("Недостаточно прав.", show_alert=True)
+
+    broadcast_id = int(call.data.split(":")[1])
+
+    async with connect() as db:
+        await db.execute(
+            "UPDATE broadcasts SET status='cancelled' WHERE id=? AND status='draft'",
+            (broadcast_id,)
+        )
+        await db.commit()
+
+    await call.message.edit_text("Рассылка отменена")
+    await call.answer()
+
+
+def _spawn(bot: Bot, broadcast_id: int):
+    """Запустить рассылку фоновой задачей (не более одной на рассылку)"""
+    task = _running.get(broadcast_id)
+    if task and not task.done():
+        return
+    task = asyncio.create_task(run_broadcast(bot, broadcast_id))
+    _running[broadcast_id] = task
+    task.add_done_callback(lambda _: _running.pop(broadcast_id, None))
+
+
+async def resume_broadcasts(bot: Bot):
+    """Продолжить рассылки, прерванные перезапуском бота"""
+    async with connect() as db:
+        cur = await db.execute("SELECT id FROM broadcasts WHERE status='running'")
+        rows = await cur.fetchall()
+
+    for (broadcast_id,) in rows:
+        logging.info("[broadcast] resuming #%s", broadcast_id)
+        _spawn(bot, broadcast_id)
+
+
+async def _send_one(bot: Bot, tg_id: int, text: str) -> str:
+    """Отправить сообщение одному получателю, вернуть статус доставки"""
+    for _ in range(3):
+        try:
+            await bot.send_message(tg_id, text)
+            return "sent"
+        except TelegramRetryAfter as e:
+            # Telegram попросил подождать — ждём и пробуем снова
+            await asyncio.sleep(e.retry_after)
+        except TelegramForbiddenError:
+            return "blocked"
+        except TelegramBadRequest as e:
+            logging.warning("[broadcast] cannot send to %s: %s", tg_id, e)
+            return "failed"
+        except Exception as e:
+            logging.warning("[broadcast] cannot send to %s: %s", tg_id, e)
+            return "failed"
+    return "failed"
+
+
+async def _progress(db: aiosqlite.Connection, broadcast_id: int) -> Dict[str, int]:
+    """Счётчики получателей по статусам"""
+    cur = await db.execute(
+        "SELECT status, COUNT(*) FROM broadcast_recipients WHERE broadcast_id=? GROUP BY status",
+        (broadcast_id,)
+    )
+    return {status: cnt for status, cnt in await cur.fetchall()}
+
+
+def _progress_text(broadcast_id: int, counts: Dict[str, int], done: bool) -> str:
+    title = "✅ Рассылка завершена" if done else "📨 Идёт рассылка"
+    return (
+        f"{title} #{broadcast_id}\n\n"
+        f"Отправлено: {counts.get('sent', 0)}\n"
+        f"Заблокировали бота: {counts.get('blocked', 0)}\n"
+        f"Ошибок: {counts.get('failed', 0)}\n"
+        f"Осталось: {counts.get('pending', 0) + counts.get('sending', 0)}"
+    )
+
+
+async def _claim_batch(broadcast_id: int) -> List[Tuple[int, Optional[int]]]:
+    """Забрать пачку получателей в отправку: [(user_id, tg_id)]
+
+    Пачка помечается 'sending' одной транзакцией, поэтому второй запуск
+    той же рассылки (в другом процессе или после смены лидера) получает
+    других получателей и не шлёт сообщения повторно. Пачку, зависшую в
+    'sending' дольше CLAIM_TIMEOUT, забирают заново.
+    """
+    now = time.time()
+    async with connect() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        cur = await db.execute("""
+            UPDATE broadcast_recipients SET status = 'sending', claimed_at = ?
+            WHERE broadcast_id = ? AND user_id IN (
+                SELECT user_id FROM broadcast_recipients
+                WHERE broadcast_id = ?
+                  AND (status = 'pending' OR (status = 'sending' AND claimed_at < ?))
+                ORDER BY user_id
+                LIMIT ?
+            )
+            RETURNING user_id
+        """, (now, broadcast_id, broadcast_id, now - CLAIM_TIMEOUT, BROADCAST_BATCH_SIZE))
+        user_ids = sorted(user_id for (user_id,) in await cur.fetchall())
+        await db.commit()
+
+        if not user_ids:
+            return []
+        cur = await db.execute(
+            f"SELECT id, tg_id FROM users WHERE id IN ({','.join('?' * len(user_ids))})",
+            user_ids
+        )
+        tg_ids = dict(await cur.fetchall())
+
+    # Удалённый пользователь остаётся без tg_id — его отметим как ошибку
+    return [(user_id, tg_ids.get(user_id)) for user_id in user_ids]
+
+
+async def run_broadcast(bot: Bot, broadcast_id: int):
+    """Отправка рассылки пачками с ограничением скорости
+
+    Получатели забираются из БД пачками (см. _claim_batch), статус каждого
+    сохраняется после пачки, поэтому после рестарта рассылка продолжается
+    с места остановки, а параллельные запуски не дублируют сообщения.
+    Скорость ниже глобального лимита Telegram, чтобы обычные ответы бота
+    не упирались в лимиты во время рассылки.
+    """
+    async with connect() as db:
+        cur = await db.execute(
+            "SELECT text, chat_id, message_id FROM broadcasts WHERE id=?",
+            (broadcast_id,)
+        )
+        row = await cur.fetchone()
+    if not row:
+        return
+    text, chat_id, message_id = row
+
+    bucket = TokenBucket(BROADCAST_RATE, BROADCAST_RATE)
+    last_progress = 0.0
+
+    while True:
+        batch = await _claim_batch(broadcast_id)
+        if not batch:
+            break
+
+        results = []
+        for user_id, tg_id in batch:
+            if tg_id is None:
+                results.append(("failed", broadcast_id, user_id))
+                continue
+            await bucket.acquire()
+            status = await _send_one(bot, tg_id, text)
+            results.append((status, broadcast_id, user_id))
+
+        blocked = [(user_id,) for status, _, user_id in results if status == "blocked"]
+
+        async with connect() as db:
+            await db.executemany(
+                "UPDATE broadcast_recipients SET status=? WHERE broadcast_id=? AND user_id=?",
+                results
+            )
+            if blocked:
+                await db.executemany("UPDATE users SET is_blocked=1 WHERE id=?", blocked)
+            await db.commit()
+
+            if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                last_progress = time.monotonic()
+                counts = await _progress(db, broadcast_id)
+                await _edit_progress(bot, chat_id, message_id, _progress_text(broadcast_id, counts, False))
+
+    async with connect() as db:
+        cur = await db.execute("""
+            UPDATE broadcasts SET status='done'
+            WHERE id = ? AND status = 'running' AND NOT EXISTS (
+                SELECT 1 FROM broadcast_recipients
+                WHERE broadcast_id = ? AND status IN ('pending', 'sending')
+            )
+        """, (broadcast_id, broadcast_id))
+        await db.commit()
+        if cur.rowcount == 0:
+            # Последние пачки ещё отправляет другой запуск — он и завершит рассылку
+            return
+        counts = await _progress(db, broadcast_id)
+
+    await _edit_progress(bot, chat_id, message_id, _progress_text(broadcast_id, counts, True))
+    logging.info("[broadcast] #%s finished: %s", broadcast_id, counts)
+
+
+async def _edit_progress(bot: Bot, chat_id: int, message_id: int, text: str):
+    """Обновить сообщение с прогрессом рассылки"""
+    if not chat_id or not message_id:
+        return
+    try:
+        await bot.edit_message_text(text=text, chat_id=chat_id, message_id=message_id)
+    except Exception as e:
+        logging.warning("[broadcast] cannot update progress: %s", e)
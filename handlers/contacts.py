@@ -1,9 +1,9 @@
-import aiosqlite
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.filters import Command
-from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import Message
 
-from config import DB_PATH, ADMIN_ID
+from config import ADMIN_ID
+from utils.settings import get_contacts_message, save_setting
 
 router = Router()
 
@@ -12,30 +12,8 @@ router = Router()
 @router.message(Command("about"))
 async def show_contacts(message: Message):
     """Показать контакты и информацию"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        cur = await db.execute("SELECT key, value FROM settings WHERE key LIKE 'contact_%'")
-        settings = {row[0]: row[1] for row in await cur.fetchall()}
-    
-    address = settings.get('contact_address', 'Не указан')
-    phone = settings.get('contact_phone', 'Не указан')
-    instagram = settings.get('contact_instagram', '')
-    hours = settings.get('contact_hours', 'Не указаны')
-    map_url = settings.get('contact_map_url', '')
-    
-    text = (
-        "📍 *Контакты и информация*\n\n"
-        f"🏠 Адрес: {address}\n"
-        f"📞 Телефон: {phone}\n"
-        f"🕐 Часы работы: {hours}\n"
-    )
-    
-    kb_rows = []
-    if map_url:
-        kb_rows.append([InlineKeyboardButton(text="🗺 Как добраться", url=map_url)])
-    if instagram:
-        kb_rows.append([InlineKeyboardButton(text="📸 Instagram", url=instagram)])
-    
-    kb = InlineKeyboardMarkup(inline_keyboard=kb_rows) if kb_rows else None
+    # Сообщение собрано заранее и пересобирается только при изменении контактов
+    text, kb = await get_contacts_message()
     
     await message.answer(text, parse_mode="Markdown", reply_markup=kb)
 
@@ -60,15 +38,6 @@ async def set_contacts_start(message: Message):
     )
 
 
-async def save_setting(key: str, value: str):
-    """Сохранить настройку"""
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("""
-            INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)
-        """, (key, value))
-        await db.commit()
-
-
 @router.message(Command("set_address"))
 async def set_address(message: Message):
     """Установить адрес"""
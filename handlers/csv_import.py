@@ -0,0 +1,158 @@
+import csv
+import io
+import logging
+from datetime import datetime
+from typing import Iterable, List, Tuple
+from aiogram import Router, F
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from config import ADMIN_ID, IMPORT_MAX_BYTES
+from database import connect
+
+router = Router()
+
+# Сколько ошибок показывать в ответе
+MAX_ERRORS_SHOWN = 10
+
+
+@router.message(Command("import"))
+async def import_help(message: Message):
+    """Инструкция по импорту CSV (только админ)"""
+    if message.from_user.id != ADMIN_ID:
+        return await message.answer("Недостаточно прав.")
+
+    await message.answer(
+        "📥 *Импорт из CSV*\n\n"
+        "Пришли файл `.csv`, по одной строке на окно или услугу:\n\n"
+        "`slot,2025-10-10,14:00`\n"
+        "`service,Маникюр,1500,90`\n\n"
+        "Разделитель — запятая или точка с запятой. "
+        "Дата также может быть в формате ДД.ММ.ГГГГ, "
+        "длительность услуги необязательна (по умолчанию 60 мин). "
+        "Существующие окна и услуги пропускаются.",
+        parse_mode="Markdown"
+    )
+
+
+def _parse_dt(date_str: str, time_str: str) -> datetime:
+    """Дата в формате ГГГГ-ММ-ДД или ДД.ММ.ГГГГ + время ЧЧ:ММ"""
+    for fmt in ("%Y-%m-%d %H:%M", "%d.%m.%Y %H:%M"):
+        try:
+            return datetime.strptime(f"{date_str} {time_str}", fmt)
+        except ValueError:
+            continue
+    raise ValueError(f"дата/время не распознаны: {date_str} {time_str}")
+
+
+def parse_import_rows(lines: Iterable[str]) -> Tuple[List[tuple], List[tuple], List[str]]:
+    """Разбор CSV построчно (без загрузки всего файла в список строк)
+
+    Returns:
+        slots: [(dt_iso,)]
+        services: [(name, price, duration_minutes)]
+        errors: Описания невалидных строк
+    """
+    slots = []
+    services = []
+    errors = []
+    now = datetime.now()
+
+    lines = iter(lines)
+    first = next(lines, "")
+    delimiter = ";" if first.count(";") > first.count(",") else ","
+
+    def all_lines():
+        yield first
+        yield from lines
+
+    for line_no, row in enumerate(csv.reader(all_lines(), delimiter=delimiter), 1):
+        row = [cell.strip() for cell in row]
+        if not row or not any(row) or row[0].startswith("#"):
+            continue
+
+        kind = row[0].lower()
+        try:
+            if kind == "slot":
+                if len(row) < 3:
+                    raise ValueError("нужно: slot,дата,время")
+                dt = _parse_dt(row[1], row[2])
+                if dt < now:
+                    raise ValueError("окно в прошлом")
+                slots.append((dt.isoformat(),))
+            elif kind == "service":
+                if len(row) < 3 or not row[1]:
+                    raise ValueError("нужно: service,название,цена[,минуты]")
+                try:
+                    price = int(row[2])
+                    duration = int(row[3]) if len(row) > 3 and row[3] else 60
+                except ValueError:
+                    raise ValueError("цена и длительность должны быть числами")
+                if price < 0 or duration <= 0:
+                    raise ValueError("цена и длительность должны быть положительными")
+                services.append((row[1], price, duration))
+            elif line_no == 1 and kind in ("type", "тип"):
+                # Строка заголовка
+                continue
+            else:
+                raise ValueError(f"неизвестный тип строки «{row[0]}»")
+        except ValueError as e:
+            errors.append(f"стр. {line_no}: {e}")
+
+    return slots, services, errors
+
+
+@router.message(F.document & (F.from_user.id == ADMIN_ID))
+async def import_document(message: Message):
+    """Импорт окон и услуг из присланного CSV"""
+    document = message.document
+    if not (document.file_name or "").lower().endswith(".csv"):
+        return await message.answer("Для импорта пришли файл в формате .csv (см. /import)")
+
+    if document.file_size and document.file_size > IMPORT_MAX_BYTES:
+        return await message.answer(f"❌ Файл слишком большой (максимум {IMPORT_MAX_BYTES // 1024} КБ)")
+
+    buffer = io.BytesIO()
+    await message.bot.download(document, destination=buffer)
+    buffer.seek(0)
+
+    try:
+        text = io.TextIOWrapper(buffer, encoding="utf-8-sig", newline="")
+        slots, services, errors = parse_import_rows(text)
+    except UnicodeDecodeError:
+        return await message.answer("❌ Файл должен быть в кодировке UTF-8")
+
+    async with connect() as db:
+        try:
+            await db.execute("BEGIN IMMEDIATE")
+
+            before = db.total_changes
+            await db.executemany("INSERT OR IGNORE INTO timeslots(dt) VALUES (?)", slots)
+            created_slots = db.total_changes - before
+
+            before = db.total_changes
+            await db.executemany(
+                "INSERT OR IGNORE INTO services(name, price, duration_minutes) VALUES (?, ?, ?)",
+                services
+            )
+            created_services = db.total_changes - before
+
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logging.error("CSV import error: %s", e)
+            return await message.answer("❌ Ошибка импорта, изменения не применены")
+
+    text = (
+        "📥 Импорт завершён\n\n"
+        f"🕐 Окна: создано {created_slots}, пропущено {len(slots) - created_slots}\n"
+        f"💅 Услуги: создано {created_services}, пропущено {len(services) - created_services}\n"
+        f"⚠️ Ошибочных строк: {len(errors)}"
+    )
+    if errors:
+        text += "\n\n" + "\n".join(errors[:MAX_ERRORS_SHOWN])
+        if len(errors) > MAX_ERRORS_SHOWN:
+            text += f"\n…и ещё {len(errors) - MAX_ERRORS_SHOWN}"
+
+    # Без Markdown: в тексте ошибок могут быть данные из файла
+    await message.answer(text)
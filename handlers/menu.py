@@ -0,0 +1,32 @@
+import re
+
+from aiogram import Router
+from aiogram.types import Message
+
+from keyboards.main_menu import BTN_BOOK, BTN_MY, BTN_SERVICES, BTN_CONTACTS
+from utils import metrics
+from utils.triggers import TriggerTable, TriggerFilter, TriggerHandler
+from . import user, booking
+
+router = Router()
+
+# Кнопки главного меню и ключевые слова в свободном тексте
+triggers = TriggerTable()
+triggers.add_exact([BTN_BOOK], booking.start_booking)
+triggers.add_exact([BTN_MY], booking.my_bookings)
+triggers.add_exact([BTN_SERVICES], user.list_services)
+triggers.add_exact([BTN_CONTACTS], user.contacts_button)
+# Порядок — как у прежних фильтров роутеров: услуги, контакты, затем эмодзи кнопок
+triggers.add_pattern("услу|цены", user.list_services, re.IGNORECASE)
+triggers.add_pattern("[Кк]онтакт", user.contacts_button)
+triggers.add_pattern("^📅", booking.start_booking)
+triggers.add_pattern("^👀", booking.my_bookings)
+
+
+@router.message(TriggerFilter(triggers))
+async def text_trigger(message: Message, trigger: TriggerHandler):
+    """Кнопки меню и текстовые триггеры — один поиск по таблице вместо цепочки фильтров"""
+    stats = metrics.current_update.get()
+    if stats:
+        stats.handler = trigger.__name__
+    return await trigger(message)
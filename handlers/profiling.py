@@ -0,0 +1,74 @@
+import asyncio
+import logging
+from datetime import datetime
+from aiogram import Bot, Router
+from aiogram.filters import Command
+from aiogram.types import Message, BufferedInputFile
+
+from config import ADMIN_ID, PROFILE_INTERVAL_MS, PROFILE_MAX_SECONDS
+from utils import profiler
+from utils.profiler import SamplingProfiler
+
+router = Router()
+
+
+async def _send_report(bot: Bot, chat_id: int, result: SamplingProfiler):
+    """Отправить стеки файлом, сводку по обработчикам — подписью"""
+    name = f"profile_{datetime.fromtimestamp(result.started_at).strftime('%Y%m%d_%H%M%S')}.collapsed.txt"
+    await bot.send_document(
+        chat_id,
+        BufferedInputFile(result.collapsed().encode("utf-8"), filename=name),
+        caption=f"🔬 Профиль\n\n{result.summary()}"[:1024],
+    )
+
+
+async def _stop_after(bot: Bot, chat_id: int, result: SamplingProfiler, seconds: float):
+    """Жёсткий лимит: остановить профилирование и прислать результат, если про него забыли"""
+    await asyncio.sleep(seconds + 1)
+    if profiler.active() is result:
+        profiler.stop_profiling()
+        try:
+            await _send_report(bot, chat_id, result)
+        except Exception as e:
+            logging.warning("Cannot send profile: %s", e)
+
+
+@router.message(Command("profile"))
+async def profile(message: Message):
+    """Сэмплирующий профилировщик обработчиков и крон-задач (только админ)"""
+    if message.from_user.id != ADMIN_ID:
+        return await message.answer("Недостаточно прав.")
+
+    parts = message.text.strip().split()
+    action = parts[1] if len(parts) > 1 else ""
+
+    if action == "start":
+        seconds = PROFILE_MAX_SECONDS
+        if len(parts) > 2 and parts[2].isdigit():
+            seconds = min(int(parts[2]), PROFILE_MAX_SECONDS)
+        try:
+            result = profiler.start_profiling(PROFILE_INTERVAL_MS / 1000, seconds)
+        except RuntimeError:
+            return await message.answer("Профилировщик уже запущен. Останови: /profile stop")
+
+        asyncio.create_task(_stop_after(message.bot, message.chat.id, result, seconds))
+        return await message.answer(
+            f"🔬 Профилирование запущено (до {seconds} с, сэмпл раз в {PROFILE_INTERVAL_MS} мс).\n"
+            f"Останови: /profile stop"
+        )
+
+    if action == "stop":
+        result = profiler.stop_profiling()
+        if not result:
+            return await message.answer("Профилировщик не запущен.")
+        return await _send_report(message.bot, message.chat.id, result)
+
+    current = profiler.active()
+    status = f"запущен {current.duration:.0f} с назад" if current and current.running else "не запущен"
+    await message.answer(
+        f"🔬 Профилировщик {status}.\n\n"
+        f"/profile start [секунд] — запустить (не дольше {PROFILE_MAX_SECONDS} с)\n"
+        f"/profile stop — остановить и получить стеки\n\n"
+        f"Файл — стеки в формате collapsed (flamegraph.pl, speedscope.app), "
+        f"первый элемент стека — обработчик или крон-задача."
+    )
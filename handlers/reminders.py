@@ -1,25 +1,68 @@
 import logging
-import aiosqlite
 from datetime import datetime, timedelta
 from aiogram import Router, Bot, F
 from aiogram.filters import Command
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 
-from config import DB_PATH, ADMIN_ID
+from config import ADMIN_ID
+from database import connect
 from utils.misc import iso_format
+from utils.idempotency import idempotent
+from utils.fanout import fanout
 
 router = Router()
 
 
+async def _claim_reminder(booking_id: int, flag: str) -> bool:
+    """Пометить напоминание как отправленное, если его ещё никто не взял
+
+    Returns:
+        True — напоминание наше и его нужно отправить
+    """
+    async with connect() as db:
+        cur = await db.execute(
+            f"UPDATE bookings SET {flag}=1 WHERE id=? AND COALESCE({flag}, 0)=0",
+            (booking_id,)
+        )
+        await db.commit()
+        return cur.rowcount == 1
+
+
+async def _release_reminder(booking_id: int, flag: str):
+    """Снять отметку, если отправить напоминание не удалось"""
+    async with connect() as db:
+        await db.execute(f"UPDATE bookings SET {flag}=0 WHERE id=?", (booking_id,))
+        await db.commit()
+
+
+async def find_reminder_candidates(flag: str, start: datetime, end: datetime) -> list:
+    """Записи в окне [start, end), по которым напоминание flag ещё не отправлено
+
+    Returns:
+        List of (booking_id, tg_id, name, dt)
+    """
+    async with connect() as db:
+        cur = await db.execute(f"""
+            SELECT b.id, u.tg_id, u.name, t.dt
+            FROM bookings b
+            JOIN users u ON u.id = b.user_id
+            JOIN timeslots t ON t.id = b.timeslot_id
+            WHERE COALESCE(b.{flag},0) = 0
+              AND t.dt >= ?
+              AND t.dt <  ?
+        """, (iso_format(start), iso_format(end)))
+        return await cur.fetchall()
+
+
 async def remind_24h_before(bot: Bot):
     """Отправка напоминаний за 24 часа до записи"""
     now = datetime.now()
     start = now + timedelta(hours=24)
     end = start + timedelta(minutes=10)
 
-    logging.info(f"[24h] now={iso_format(now)}  window=[{iso_format(start)} .. {iso_format(end)})")
+    logging.info("[24h] now=%s  window=[%s .. %s)", iso_format(now), iso_format(start), iso_format(end))
 
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         # Добавляем колонку если её нет
         try:
             await db.execute("ALTER TABLE bookings ADD COLUMN reminded24 INTEGER DEFAULT 0")
@@ -27,22 +70,18 @@ async def remind_24h_before(bot: Bot):
         except Exception:
             pass
 
-        cur = await db.execute("""
-            SELECT b.id, u.tg_id, u.name, t.dt
-            FROM bookings b
-            JOIN users u ON u.id = b.user_id
-            JOIN timeslots t ON t.id = b.timeslot_id
-            WHERE COALESCE(b.reminded24,0) = 0
-              AND t.dt >= ?
-              AND t.dt <  ?
-        """, (iso_format(start), iso_format(end)))
-        rows = await cur.fetchall()
+    rows = await find_reminder_candidates("reminded24", start, end)
 
-    logging.info(f"[24h] candidates found: {len(rows)}")
+    logging.info("[24h] candidates found: %d", len(rows))
     if not rows:
         return
 
     for bid, tg_id, name, dt_str in rows:
+        # Сначала атомарно «забираем» напоминание, потом отправляем:
+        # даже два экземпляра бота не отправят его дважды
+        if not await _claim_reminder(bid, "reminded24"):
+            continue
+
         try:
             when = datetime.fromisoformat(dt_str)
             time_str = when.strftime("%d.%m %H:%M")
@@ -61,14 +100,12 @@ async def remind_24h_before(bot: Bot):
 
             await bot.send_message(tg_id, text, reply_markup=kb)
 
-            async with aiosqlite.connect(DB_PATH) as db:
-                await db.execute("UPDATE bookings SET reminded24=1 WHERE id=?", (bid,))
-                await db.commit()
-
-            logging.info(f"[24h] ✅ reminder sent for booking #{bid} to user={tg_id}")
+            logging.info("[24h] ✅ reminder sent for booking #%s to user=%s", bid, tg_id)
 
         except Exception as e:
-            logging.warning(f"[24h] ⚠️ failed to send reminder for #{bid}: {e}")
+            # Не отправилось — снимаем отметку, следующий запуск попробует снова
+            await _release_reminder(bid, "reminded24")
+            logging.warning("[24h] ⚠️ failed to send reminder for #%s: %s", bid, e)
 
 
 async def remind_12h_before(bot: Bot):
@@ -77,25 +114,18 @@ async def remind_12h_before(bot: Bot):
     start = now + timedelta(hours=12)
     end = start + timedelta(minutes=10)
 
-    logging.info(f"[12h] now={iso_format(now)}  window=[{iso_format(start)} .. {iso_format(end)})")
+    logging.info("[12h] now=%s  window=[%s .. %s)", iso_format(now), iso_format(start), iso_format(end))
 
-    async with aiosqlite.connect(DB_PATH) as db:
-        cur = await db.execute("""
-            SELECT b.id, u.tg_id, u.name, t.dt
-            FROM bookings b
-            JOIN users u ON u.id = b.user_id
-            JOIN timeslots t ON t.id = b.timeslot_id
-            WHERE COALESCE(b.reminded12,0) = 0
-              AND t.dt >= ?
-              AND t.dt <  ?
-        """, (iso_format(start), iso_format(end)))
-        rows = await cur.fetchall()
+    rows = await find_reminder_candidates("reminded12", start, end)
 
-    logging.info(f"[12h] candidates found: {len(rows)}")
+    logging.info("[12h] candidates found: %d", len(rows))
     if not rows:
         return
 
     for bid, tg_id, name, dt_str in rows:
+        if not await _claim_reminder(bid, "reminded12"):
+            continue
+
         try:
             when = datetime.fromisoformat(dt_str)
             time_str = when.strftime("%d.%m %H:%M")
@@ -114,14 +144,11 @@ async def remind_12h_before(bot: Bot):
 
             await bot.send_message(tg_id, text, reply_markup=kb)
 
-            async with aiosqlite.connect(DB_PATH) as db:
-                await db.execute("UPDATE bookings SET reminded12=1 WHERE id=?", (bid,))
-                await db.commit()
-
-            logging.info(f"[12h] ✅ reminder sent for booking #{bid} to user={tg_id}")
+            logging.info("[12h] ✅ reminder sent for booking #%s to user=%s", bid, tg_id)
 
         except Exception as e:
-            logging.warning(f"[12h] ⚠️ failed to send reminder for #{bid}: {e}")
+            await _release_reminder(bid, "reminded12")
+            logging.warning("[12h] ⚠️ failed to send reminder for #%s: %s", bid, e)
 
 
 async def remind_1h_before(bot: Bot):
@@ -130,9 +157,9 @@ async def remind_1h_before(bot: Bot):
     start = now + timedelta(hours=1)
     end = start + timedelta(minutes=10)
 
-    logging.info(f"[1h] now={iso_format(now)}  window=[{iso_format(start)} .. {iso_format(end)})")
+    logging.info("[1h] now=%s  window=[%s .. %s)", iso_format(now), iso_format(start), iso_format(end))
 
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         # Добавляем колонку если её нет
         try:
             await db.execute("ALTER TABLE bookings ADD COLUMN reminded1h INTEGER DEFAULT 0")
@@ -140,22 +167,16 @@ async def remind_1h_before(bot: Bot):
         except Exception:
             pass
 
-        cur = await db.execute("""
-            SELECT b.id, u.tg_id, u.name, t.dt
-            FROM bookings b
-            JOIN users u ON u.id = b.user_id
-            JOIN timeslots t ON t.id = b.timeslot_id
-            WHERE COALESCE(b.reminded1h,0) = 0
-              AND t.dt >= ?
-              AND t.dt <  ?
-        """, (iso_format(start), iso_format(end)))
-        rows = await cur.fetchall()
+    rows = await find_reminder_candidates("reminded1h", start, end)
 
-    logging.info(f"[1h] candidates found: {len(rows)}")
+    logging.info("[1h] candidates found: %d", len(rows))
     if not rows:
         return
 
     for bid, tg_id, name, dt_str in rows:
+        if not await _claim_reminder(bid, "reminded1h"):
+            continue
+
         try:
             when = datetime.fromisoformat(dt_str)
             time_str = when.strftime("%H:%M")
@@ -169,32 +190,28 @@ async def remind_1h_before(bot: Bot):
 
             await bot.send_message(tg_id, text)
 
-            async with aiosqlite.connect(DB_PATH) as db:
-                await db.execute("UPDATE bookings SET reminded1h=1 WHERE id=?", (bid,))
-                await db.commit()
-
-            logging.info(f"[1h] ✅ reminder sent for booking #{bid} to user={tg_id}")
+            logging.info("[1h] ✅ reminder sent for booking #%s to user=%s", bid, tg_id)
 
         except Exception as e:
-            logging.warning(f"[1h] ⚠️ failed to send reminder for #{bid}: {e}")
+            await _release_reminder(bid, "reminded1h")
+            logging.warning("[1h] ⚠️ failed to send reminder for #%s: %s", bid, e)
 
 
 @router.callback_query(F.data.startswith("confirm_attendance:"))
+@idempotent
 async def confirm_attendance(call: CallbackQuery):
     """Подтверждение посещения клиентом"""
     booking_id = int(call.data.split(":")[1])
     
-    async with aiosqlite.connect(DB_PATH) as db:
-        # Добавляем колонку если её нет
-        try:
-            await db.execute("ALTER TABLE bookings ADD COLUMN confirmed INTEGER DEFAULT 0")
-            await db.commit()
-        except Exception:
-            pass
-        
-        # Подтверждаем запись
-        await db.execute("UPDATE bookings SET confirmed=1 WHERE id=?", (booking_id,))
+    async with connect() as db:
+        # Подтверждаем запись (колонку confirmed добавляет db_init);
+        # уже подтверждённую не трогаем — мастер получит уведомление один раз
+        cur = await db.execute(
+            "UPDATE bookings SET confirmed=1 WHERE id=? AND COALESCE(confirmed, 0)=0",
+            (booking_id,)
+        )
         await db.commit()
+        newly_confirmed = cur.rowcount == 1
         
         # Получаем информацию о записи
         cur = await db.execute("""
@@ -205,29 +222,28 @@ async def confirm_attendance(call: CallbackQuery):
         """, (booking_id,))
         row = await cur.fetchone()
     
+    calls = [call.answer("✅ Запись подтверждена!")]
     if row:
         dt_str, price = row
         when = datetime.fromisoformat(dt_str).strftime("%d.%m %H:%M")
         
-        await call.message.edit_text(
+        calls.append(call.message.edit_text(
             f"✅ *Отлично!*\n\n"
             f"Твоя запись подтверждена:\n"
             f"📅 {when}\n"
             f"💰 {price} ₽\n\n"
             f"Жду тебя! 💅",
             parse_mode="Markdown"
-        )
+        ))
         
         # Уведомляем мастера
-        try:
-            await call.bot.send_message(
+        if newly_confirmed:
+            calls.append(call.bot.send_message(
                 ADMIN_ID,
                 f"✅ Клиент {call.from_user.full_name} подтвердил запись #{booking_id} на {when}"
-            )
-        except Exception as e:
-            logging.warning(f"Cannot notify admin: {e}")
+            ))
     
-    await call.answer("✅ Запись подтверждена!")
+    await fanout(*calls, label="confirm_attendance")
 
 
 @router.message(Command("debug_reminders"))
@@ -248,7 +264,7 @@ async def debug_reminders(message: Message):
     text = "🔍 *Отладка напоминаний*\n\n"
     text += f"Текущее время: {iso_format(now)}\n\n"
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         for label, (start, end) in windows.items():
             cur = await db.execute("""
                 SELECT b.id, u.name, t.dt, 
@@ -297,7 +313,7 @@ async def test_reminder(message: Message):
     
     booking_id = int(parts[1])
     
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cur = await db.execute("""
             SELECT u.tg_id, u.name, t.dt
             FROM bookings b
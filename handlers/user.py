@@ -1,11 +1,11 @@
 import logging
-import aiosqlite
 from aiogram import Router, F
 from aiogram.filters import Command, CommandStart
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton
 
-from config import DB_PATH
+from database import connect
 from keyboards.main_menu import main_menu_kb
+from utils.identity import ensure_user, set_phone, unblock
 
 router = Router()
 
@@ -13,15 +13,12 @@ router = Router()
 @router.message(CommandStart())
 async def on_start(message: Message):
     """Обработка команды /start"""
-    # Регистрация пользователя (если ещё не в БД)
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute(
-            "INSERT OR IGNORE INTO users(tg_id, name) VALUES (?, ?)",
-            (message.from_user.id, message.from_user.full_name or "")
-        )
-        await db.commit()
+    # Регистрация пользователя (известные берутся из кэша без записи в БД)
+    await ensure_user(message.from_user.id, message.from_user.full_name or "")
+    # После разблокировки Telegram присылает /start — снова включаем в рассылки
+    await unblock(message.from_user.id)
 
-    logging.info(f"User started: tg_id={message.from_user.id}")
+    logging.info("User started: tg_id=%s", message.from_user.id)
 
     await message.answer(
         "Привет! Я бот для записи к мастеру 💅\nВыбери действие:",
@@ -30,10 +27,9 @@ async def on_start(message: Message):
 
 
 @router.message(Command("services"))
-@router.message(F.text.lower().contains("услу") | F.text.lower().contains("цены"))
 async def list_services(message: Message):
     """Показать список услуг и цен"""
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cur = await db.execute("SELECT id, name, price FROM services ORDER BY id")
         rows = await cur.fetchall()
 
@@ -47,9 +43,7 @@ async def list_services(message: Message):
 async def on_contact(message: Message):
     """Обработка контакта (номера телефона)"""
     phone = message.contact.phone_number
-    async with aiosqlite.connect(DB_PATH) as db:
-        await db.execute("UPDATE users SET phone=? WHERE tg_id=?", (phone, message.from_user.id))
-        await db.commit()
+    await set_phone(message.from_user.id, message.from_user.full_name or "", phone)
     
     # Сразу показываем выбор услуг
     from handlers.booking import pending
@@ -62,8 +56,7 @@ async def on_contact(message: Message):
     await message.answer(text, parse_mode="Markdown", reply_markup=kb)
 
 
-@router.message(F.text.contains("Контакт") | F.text.contains("контакт"))
 async def contacts_button(message: Message):
-    """Обработка кнопки Контакты"""
+    """Обработка кнопки Контакты (вызывается из таблицы триггеров handlers/menu.py)"""
     from handlers.contacts import show_contacts
     await show_contacts(message)
\ No newline at end of file
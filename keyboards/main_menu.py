@@ -1,12 +1,18 @@
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 
+# Тексты кнопок главного меню (по ним же работает таблица триггеров handlers/menu.py)
+BTN_BOOK = "📅 Записаться"
+BTN_MY = "👀 Мои записи"
+BTN_SERVICES = "💰 Услуги и цены"
+BTN_CONTACTS = "📍 Контакты"
+
 
 def main_menu_kb() -> ReplyKeyboardMarkup:
     """Главное меню бота"""
     return ReplyKeyboardMarkup(
         keyboard=[
-            [KeyboardButton(text="📅 Записаться"), KeyboardButton(text="👀 Мои записи")],
-            [KeyboardButton(text="💰 Услуги и цены"), KeyboardButton(text="📍 Контакты")],
+            [KeyboardButton(text=BTN_BOOK), KeyboardButton(text=BTN_MY)],
+            [KeyboardButton(text=BTN_SERVICES), KeyboardButton(text=BTN_CONTACTS)],
         ],
         resize_keyboard=True
     )
\ No newline at end of file
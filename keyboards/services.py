@@ -1,7 +1,6 @@
-import aiosqlite
 from typing import Set, Tuple
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from config import DB_PATH
+from database import connect
 
 
 async def render_services_keyboard(selected: Set[int]) -> Tuple[str, InlineKeyboardMarkup, int, int]:
@@ -13,7 +12,7 @@ async def render_services_keyboard(selected: Set[int]) -> Tuple[str, InlineKeybo
         total_price: Общая стоимость
         total_minutes: Общее время в минутах
     """
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cur = await db.execute("SELECT id, name, price, duration_minutes FROM services ORDER BY id")
         services = await cur.fetchall()
 
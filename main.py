@@ -4,15 +4,22 @@ import logging
 
 from aiogram import Bot, Dispatcher
 
-from config import BOT_TOKEN
+from config import BOT_TOKEN, BOT_MODE, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WORKERS, METRICS_PORT
 from database import db_init
+from utils.settings import load_settings
 from handlers import register_handlers
+from middlewares import setup_middlewares
 from handlers.reminders import remind_24h_before, remind_12h_before, remind_1h_before
+from handlers.broadcast import resume_broadcasts
+from utils.archive import archive_past
+from webserver import build_app, start_webserver, start_metrics_server
+from workers import run_sharded
+from utils import leader
+from utils.leader import leader_only
+from utils import health
+from utils.logs import setup_logging
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+setup_logging()
 
 bot = Bot(BOT_TOKEN)
 dp = Dispatcher()
@@ -24,8 +31,12 @@ async def main():
     await db_init()
     logging.info("✅ Database initialized")
     
+    # Кэш настроек (контакты и т.п.) — дальше читается без запросов к БД
+    await load_settings()
+    
     # Регистрация всех обработчиков
     register_handlers(dp)
+    setup_middlewares(dp, bot)
     logging.info("✅ Handlers registered")
     
     # Запуск крон-задач для напоминаний
@@ -34,21 +45,70 @@ async def main():
     # '*/30 * * * *' - каждые 30 минут
     
     # Для теста: каждую минуту
-    cron_24h = aiocron.crontab('*/30 * * * *', func=lambda: remind_24h_before(bot), start=True)
-    cron_12h = aiocron.crontab('*/30 * * * *', func=lambda: remind_12h_before(bot), start=True)
-    cron_1h = aiocron.crontab('*/15 * * * *', func=lambda: remind_1h_before(bot), start=True)
+    # Задачи выполняются только на экземпляре-лидере (см. utils/leader.py)
+    cron_24h = aiocron.crontab('*/30 * * * *', func=leader_only(lambda: remind_24h_before(bot)), start=True)
+    cron_12h = aiocron.crontab('*/30 * * * *', func=leader_only(lambda: remind_12h_before(bot)), start=True)
+    cron_1h = aiocron.crontab('*/15 * * * *', func=leader_only(lambda: remind_1h_before(bot)), start=True)
+    
+    # Ночной перенос прошедших записей и слотов в архив + incremental vacuum
+    cron_archive = aiocron.crontab('30 3 * * *', func=leader_only(archive_past), start=True)
     
     logging.info("⏰ Reminder crons started:")
     logging.info("   • 24h reminder - every minute (test mode)")
     logging.info("   • 12h reminder - every minute (test mode)")
     logging.info("   • 1h reminder - every minute (test mode)")
+    logging.info("   • archive of past bookings - daily at 03:30")
     logging.info("")
     logging.info("📝 Change cron schedule in main.py for production!")
     logging.info("   Recommended: '*/30 * * * *' (every 30 minutes)")
     
+    # Лидерство среди экземпляров; новый лидер продолжает прерванные рассылки
+    heartbeat = asyncio.create_task(leader.heartbeat(on_elected=lambda: resume_broadcasts(bot)))
+    
+    # Метрики Prometheus и /health на локальном порту (воркеры — на следующих портах)
+    metrics_runner = await start_metrics_server(METRICS_PORT)
+    health_monitor = asyncio.create_task(health.monitor(bot))
+    health.set_ready()
+    
     # Запуск бота
-    logging.info("🚀 Bot started!")
-    await dp.start_polling(bot)
+    try:
+        if WORKERS > 1:
+            # Несколько процессов: этот процесс только принимает и раздаёт обновления
+            await run_sharded(bot, dp, run_webhook)
+        elif BOT_MODE == "webhook":
+            await run_webhook()
+        else:
+            logging.info("🚀 Bot started! (polling)")
+            await dp.start_polling(bot)
+    finally:
+        heartbeat.cancel()
+        health_monitor.cancel()
+        await leader.release()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+
+
+async def run_webhook(webhook_handler=None):
+    """Приём обновлений через webhook вместо long polling"""
+    if not WEBHOOK_URL:
+        raise RuntimeError("BOT_MODE=webhook требует WEBHOOK_URL")
+    if not WEBHOOK_SECRET:
+        # Без секрета любой, кто знает адрес, может присылать поддельные обновления
+        raise RuntimeError("BOT_MODE=webhook требует WEBHOOK_SECRET")
+    
+    runner = await start_webserver(build_app(dp, bot, webhook_handler))
+    await bot.set_webhook(
+        f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    logging.info("🚀 Bot started! (webhook %s)", WEBHOOK_PATH)
+    
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await bot.session.close()
 
 
 if __name__ == "__main__":
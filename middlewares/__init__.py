@@ -0,0 +1,43 @@
+from typing import Optional
+from aiogram import Bot, Dispatcher
+from config import (
+    RECORD_UPDATES, RECORD_SECRET, USER_QUEUE_DEPTH, SCHEDULER_CONCURRENCY, SCHEDULER_QUEUE_SIZE,
+    THROTTLE_MESSAGE_RATE, THROTTLE_MESSAGE_BURST, THROTTLE_CALLBACK_RATE, THROTTLE_CALLBACK_BURST,
+)
+from .idempotency import AnswerCaptureMiddleware
+from .metrics import UpdateMetricsMiddleware, HandlerNameMiddleware, ApiMetricsMiddleware
+from .recorder import RecorderMiddleware, UpdateRecorder
+from .scheduler import SchedulerMiddleware
+from .serialize import UserSerializeMiddleware
+from .throttle import ThrottleMiddleware
+
+
+def setup_middlewares(dp: Dispatcher, bot: Bot, worker: Optional[int] = None):
+    """Регистрация middleware диспетчера и сессии бота
+
+    worker — номер процесса-воркера (у каждого свой файл записи обновлений).
+    """
+    if RECORD_UPDATES:
+        path = RECORD_UPDATES if worker is None else f"{RECORD_UPDATES}.worker{worker}"
+        dp.update.outer_middleware(RecorderMiddleware(UpdateRecorder(path, RECORD_SECRET)))
+
+    # Антифлуд — до метрик и очереди пользователя: лишнее отбрасывается сразу
+    limits = {}
+    if THROTTLE_MESSAGE_RATE:
+        limits["message"] = (THROTTLE_MESSAGE_RATE, THROTTLE_MESSAGE_BURST)
+    if THROTTLE_CALLBACK_RATE:
+        limits["callback_query"] = (THROTTLE_CALLBACK_RATE, THROTTLE_CALLBACK_BURST)
+    if limits:
+        dp.update.outer_middleware(ThrottleMiddleware(limits))
+
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    # После метрик: ожидание своей очереди входит во время обработки обновления
+    dp.update.outer_middleware(UserSerializeMiddleware(USER_QUEUE_DEPTH))
+    # После очереди пользователя: его ждущие обновления не занимают мест планировщика
+    if SCHEDULER_CONCURRENCY:
+        dp.update.outer_middleware(SchedulerMiddleware(SCHEDULER_CONCURRENCY, SCHEDULER_QUEUE_SIZE))
+    # Внутренние middleware корневого роутера действуют и во вложенных роутерах
+    dp.message.middleware(HandlerNameMiddleware())
+    dp.callback_query.middleware(HandlerNameMiddleware())
+    bot.session.middleware(ApiMetricsMiddleware())
+    bot.session.middleware(AnswerCaptureMiddleware())
@@ -0,0 +1,19 @@
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import AnswerCallbackQuery, TelegramMethod
+
+from utils import idempotency
+
+
+class AnswerCaptureMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: ответ на нажатие запоминается для его повторов"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ):
+        if isinstance(method, AnswerCallbackQuery):
+            idempotency.remember_answer(method)
+        return await make_request(bot, method)
@@ -0,0 +1,72 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import TelegramMethod
+from aiogram.types import TelegramObject, Update
+
+from utils import metrics
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware обновлений: задержка, исход и время в SQLite/Telegram API"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        stats = metrics.UpdateStats(event.update_id)
+        token = metrics.current_update.set(stats)
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await handler(event, data)
+            status = "ok"
+            return result
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.current_update.reset(token)
+            event_type = event.event_type
+            metrics.UPDATE_SECONDS.observe(elapsed, event_type, stats.handler)
+            metrics.UPDATES_TOTAL.inc(event_type, stats.handler, status)
+            metrics.UPDATE_DB_SECONDS.observe(stats.db_seconds, stats.handler)
+            metrics.UPDATE_API_SECONDS.observe(stats.api_seconds, stats.handler)
+            metrics.UPDATE_QUERIES.observe(stats.queries, stats.handler)
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """Внутренний middleware: имя выбранного обработчика для меток метрик"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        stats = metrics.current_update.get()
+        handler_object = data.get("handler")
+        if stats and handler_object:
+            stats.handler = handler_object.callback.__name__
+        return await handler(event, data)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: время и ошибки каждого запроса к Telegram API"""
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType,
+        bot: Bot,
+        method: TelegramMethod,
+    ):
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = await make_request(bot, method)
+            failed = False
+            return response
+        finally:
+            metrics.observe_api(method.__api_method__, time.perf_counter() - started, failed)
@@ -0,0 +1,138 @@
+import atexit
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import secrets
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from config import ADMIN_ID
+
+# Псевдоним администратора: при воспроизведении ADMIN_ID задаётся равным ему
+ADMIN_PSEUDONYM = 1
+# Псевдонимы клиентов не пересекаются с настоящими id небольших значений
+PSEUDONYM_BASE = 10_000_000_000
+
+FORMAT_VERSION = 1
+
+
+def pseudonym(user_id: int, key: bytes, admin_id: int = ADMIN_ID) -> int:
+    """Стабильный (при одном ключе) и необратимый без ключа заменитель id"""
+    if user_id == admin_id:
+        return ADMIN_PSEUDONYM
+    digest = hmac.new(key, str(user_id).encode(), hashlib.sha256).digest()
+    return PSEUDONYM_BASE + int.from_bytes(digest[:4], "big")
+
+
+def pseudonym_phone(alias: int) -> str:
+    return f"+7999{alias % 10_000_000:07d}"
+
+
+def pseudonymize(data: Any, key: bytes) -> Any:
+    """Копия сырого обновления с заменёнными id, именами и телефонами пользователей"""
+    if isinstance(data, list):
+        return [pseudonymize(item, key) for item in data]
+    if not isinstance(data, dict):
+        return data
+
+    result = {k: pseudonymize(v, key) for k, v in data.items()}
+
+    # Пользователь или личный чат (id чата совпадает с id пользователя)
+    if "id" in result and ("is_bot" in result or result.get("type") == "private"):
+        alias = pseudonym(result["id"], key)
+        result["id"] = alias
+        result.pop("last_name", None)
+        result.pop("username", None)
+        if "first_name" in result:
+            result["first_name"] = f"user{alias % 100000}"
+
+    # Контакт, отправленный кнопкой «Отправить номер»
+    if "phone_number" in result:
+        alias = pseudonym(result["user_id"], key) if "user_id" in result else 0
+        if "user_id" in result:
+            result["user_id"] = alias
+        result["phone_number"] = pseudonym_phone(alias)
+        result.pop("last_name", None)
+        if "first_name" in result:
+            result["first_name"] = f"user{alias % 100000}"
+
+    return result
+
+
+class UpdateRecorder:
+    """Дописывание обновлений в файл JSON Lines: {"t": время, "u": обновление}
+
+    Как и логи (utils/logs.py), запись идёт через очередь: цикл событий
+    только кладёт сырое обновление, а псевдонимизация, сериализация и
+    запись на диск выполняются в отдельном потоке.
+    """
+
+    def __init__(self, path: str, secret: str):
+        # Без RECORD_SECRET ключ случайный: псевдонимы стабильны только до перезапуска
+        self.key = secret.encode() if secret else secrets.token_bytes(32)
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        if self._file.tell() == 0:
+            self._write({"v": FORMAT_VERSION, "started": time.time()})
+            self._file.flush()
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._writer, name="update-recorder", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        logging.info("📼 Recording updates to %s", path)
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def _writer(self):
+        """Поток записи: None в очереди — остановка"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            t, raw = item
+            try:
+                self._write({"t": t, "u": pseudonymize(raw, self.key)})
+                # Сбрасываем на диск, когда очередь разобрана, а не после каждой строки
+                if self._queue.empty():
+                    self._file.flush()
+            except Exception as e:
+                logging.warning("Cannot record update %s: %s", raw.get("update_id"), e)
+
+    def record(self, update: Update):
+        raw = update.model_dump(mode="json", exclude_none=True, by_alias=True)
+        self._queue.put((round(time.time(), 3), raw))
+
+    def close(self):
+        """Дописать очередь и закрыть файл"""
+        if self._file.closed:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+
+
+class RecorderMiddleware(BaseMiddleware):
+    """Внешний middleware обновлений: запись входящего трафика для воспроизведения"""
+
+    def __init__(self, recorder: UpdateRecorder):
+        self.recorder = recorder
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        try:
+            self.recorder.record(event)
+        except Exception as e:
+            # Запись — вспомогательная функция и не должна ломать обработку
+            logging.warning("Cannot record update %s: %s", event.update_id, e)
+        return await handler(event, data)
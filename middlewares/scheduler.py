@@ -0,0 +1,140 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from config import ADMIN_ID
+from utils import health, metrics
+
+# Классы приоритета: меньше — важнее
+COMMIT, NAVIGATION, INFO = 0, 1, 2
+PRIORITY_NAMES = {COMMIT: "commit", NAVIGATION: "navigation", INFO: "info"}
+
+# Нажатия, которые фиксируют деньги и время мастера
+COMMIT_CALLBACKS = ("confirm_booking", "cancel_booking:", "confirm_attendance:")
+# Сообщения, с которых начинается запись и просмотр своих записей
+NAVIGATION_TEXTS = ("/book", "/my", "📅", "👀")
+
+QUEUE_WAIT_SECONDS = metrics.register(metrics.Histogram(
+    "bot_scheduler_wait_seconds", "Ожидание свободного обработчика", ("priority",)))
+
+
+def classify(update: Update, user_id: int) -> int:
+    """Класс приоритета обновления"""
+    if user_id == ADMIN_ID:
+        return COMMIT
+    if update.callback_query:
+        data = update.callback_query.data or ""
+        return COMMIT if data.startswith(COMMIT_CALLBACKS) else NAVIGATION
+    message = update.message
+    if message:
+        if message.contact:
+            # Номер телефона — последний шаг перед записью
+            return COMMIT
+        if message.text and message.text.startswith(NAVIGATION_TEXTS):
+            return NAVIGATION
+    return INFO
+
+
+class PriorityGate:
+    """Не больше limit обработчиков одновременно, ожидающие — по приоритету
+
+    Очередь ограничена max_queue: при переполнении место освобождается за
+    счёт самого неважного и самого позднего из ожидающих; если новое
+    обновление не важнее всех в очереди, отбрасывается оно само.
+    """
+
+    def __init__(self, limit: int, max_queue: int):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        # [приоритет, порядковый номер, future]
+        self.queue: List[list] = []
+        self._seq = itertools.count()
+
+    async def acquire(self, priority: int) -> bool:
+        """True — можно обрабатывать (потом вызвать release), False — обновление отброшено"""
+        if self.active < self.limit and not self.queue:
+            self.active += 1
+            return True
+
+        if len(self.queue) >= self.max_queue:
+            worst = max(self.queue)
+            if worst[0] <= priority:
+                return False
+            self.queue.remove(worst)
+            heapq.heapify(self.queue)
+            # Ожидание могли отменить, а запись ещё не убрать из очереди
+            if not worst[2].done():
+                worst[2].set_result(False)
+
+        entry = [priority, next(self._seq), asyncio.get_running_loop().create_future()]
+        heapq.heappush(self.queue, entry)
+        try:
+            return await entry[2]
+        except asyncio.CancelledError:
+            if entry[2].done() and not entry[2].cancelled() and entry[2].result():
+                # Место уже выдано — возвращаем его следующему
+                self.release()
+            elif entry in self.queue:
+                self.queue.remove(entry)
+                heapq.heapify(self.queue)
+            raise
+
+    def release(self):
+        """Передать место самому важному ожидающему"""
+        while self.queue:
+            entry = heapq.heappop(self.queue)
+            # Отменённые ожидания пропускаем: их задача уберёт запись позже
+            if not entry[2].done():
+                entry[2].set_result(True)
+                return
+        self.active -= 1
+
+
+class SchedulerMiddleware(BaseMiddleware):
+    """Внешний middleware: ограничение параллельных обработчиков с приоритетами
+
+    Подтверждения и отмены записей, номер телефона и команды админа идут
+    первыми, навигация по записи — следом, информационные сообщения (/start,
+    услуги, контакты) — последними и первыми отбрасываются при перегрузке.
+    Отброшенное нажатие получает короткий ответ, чтобы у клиента не крутились
+    «часики».
+    """
+
+    def __init__(self, limit: int, max_queue: int):
+        self.gate = PriorityGate(limit, max_queue)
+        health.register_size("scheduler_queue", lambda: len(self.gate.queue))
+        metrics.register(metrics.Gauge(
+            "bot_scheduler_active", "Обновлений в обработке", lambda: self.gate.active))
+        metrics.register(metrics.Gauge(
+            "bot_scheduler_queue_length", "Обновлений в очереди планировщика", lambda: len(self.gate.queue)))
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        priority = classify(event, user.id if user else 0)
+        started = time.perf_counter()
+        if not await self.gate.acquire(priority):
+            metrics.UPDATES_DROPPED.inc(event.event_type, "shed")
+            if event.callback_query:
+                try:
+                    await data["bot"].answer_callback_query(
+                        event.callback_query.id, "⏳ Бот перегружен, нажми ещё раз через минуту")
+                except Exception:
+                    pass
+            return None
+
+        QUEUE_WAIT_SECONDS.observe(time.perf_counter() - started, PRIORITY_NAMES[priority])
+        try:
+            return await handler(event, data)
+        finally:
+            self.gate.release()
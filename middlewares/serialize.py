@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from utils import health, metrics
+
+
+class _UserQueue:
+    """Очередь обновлений одного пользователя: замок и число обновлений в ней"""
+    __slots__ = ("lock", "depth")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0
+
+
+class UserSerializeMiddleware(BaseMiddleware):
+    """Внешний middleware: обновления одного пользователя — строго по очереди
+
+    Обработчики (booking.pending, FSM) меняют состояние пользователя между
+    await; двойное нажатие на кнопку не должно выполняться параллельно само
+    с собой. Разные пользователи обрабатываются одновременно. asyncio.Lock
+    пропускает ожидающих в порядке прихода. Если у пользователя уже max_depth
+    обновлений (вместе с текущим), новые отбрасываются — так быстрые
+    многократные нажатия не копятся в памяти.
+    """
+
+    def __init__(self, max_depth: int):
+        self.max_depth = max_depth
+        self.queues: Dict[int, _UserQueue] = {}
+        health.register_size("user_queues", lambda: len(self.queues))
+
+    @staticmethod
+    def _key(data: Dict[str, Any]) -> Optional[int]:
+        user = data.get("event_from_user")
+        if user:
+            return user.id
+        chat = data.get("event_chat")
+        return chat.id if chat else None
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        key = self._key(data)
+        if key is None:
+            return await handler(event, data)
+
+        queue = self.queues.get(key)
+        if queue is None:
+            queue = self.queues[key] = _UserQueue()
+        if queue.depth >= self.max_depth:
+            metrics.UPDATES_DROPPED.inc(event.event_type, "user_queue_full")
+            logging.warning("[serialize] user %s: %d updates queued, update %s dropped", key, queue.depth, event.update_id)
+            if event.callback_query:
+                # Иначе у клиента так и будут крутиться «часики» на кнопке
+                try:
+                    await event.callback_query.answer()
+                except Exception as e:
+                    logging.debug("[serialize] cannot answer callback: %s", e)
+            return None
+
+        queue.depth += 1
+        started = time.perf_counter()
+        try:
+            async with queue.lock:
+                metrics.USER_QUEUE_WAIT_SECONDS.observe(time.perf_counter() - started)
+                return await handler(event, data)
+        finally:
+            queue.depth -= 1
+            if not queue.depth:
+                del self.queues[key]
@@ -0,0 +1,69 @@
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from config import ADMIN_ID
+from utils import health, metrics
+from utils.ratelimit import TokenBucket
+
+# Как часто выбрасывать вёдра давно молчащих пользователей (секунды)
+SWEEP_INTERVAL = 60
+
+
+class ThrottleMiddleware(BaseMiddleware):
+    """Внешний middleware: антифлуд по пользователю
+
+    У каждого пользователя свои вёдра токенов для сообщений и для нажатий
+    кнопок. Лишнее нажатие сразу получает пустой answerCallbackQuery (чтобы
+    у клиента не крутились «часики»), лишнее сообщение молча отбрасывается —
+    до обработчиков, БД и edit_text дело не доходит. Админ не ограничивается.
+    """
+
+    def __init__(self, limits: Dict[str, tuple]):
+        # тип обновления -> (токенов в секунду, размер всплеска)
+        self.limits = limits
+        self.buckets: Dict[str, Dict[int, TokenBucket]] = {event_type: {} for event_type in limits}
+        self.swept = time.monotonic()
+        health.register_size("throttle_buckets", lambda: sum(map(len, self.buckets.values())))
+
+    def _sweep(self, now: float):
+        """Ведро, которое успело наполниться, ничем не отличается от нового"""
+        self.swept = now
+        for event_type, buckets in self.buckets.items():
+            rate, capacity = self.limits[event_type]
+            idle = capacity / rate
+            for user_id in [key for key, bucket in buckets.items() if now - bucket.updated >= idle]:
+                del buckets[user_id]
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        event_type = event.event_type
+        user = data.get("event_from_user")
+        if event_type not in self.buckets or user is None or user.id == ADMIN_ID:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        if now - self.swept >= SWEEP_INTERVAL:
+            self._sweep(now)
+
+        buckets = self.buckets[event_type]
+        bucket = buckets.get(user.id)
+        if bucket is None:
+            bucket = buckets[user.id] = TokenBucket(*self.limits[event_type])
+        if bucket.try_acquire():
+            return await handler(event, data)
+
+        metrics.UPDATES_DROPPED.inc(event_type, "throttled")
+        if event_type == "callback_query":
+            try:
+                await data["bot"].answer_callback_query(event.callback_query.id)
+            except Exception as e:
+                logging.debug("[throttle] cannot answer callback: %s", e)
+        return None
@@ -0,0 +1,57 @@
+"""Отправка записанных обновлений Telegram в локальный webhook
+
+Пример:
+    python scripts/post_update.py update.json
+    python scripts/post_update.py --url http://127.0.0.1:8080/webhook --repeat 100 updates/*.json
+
+Файл — JSON одного обновления (как его присылает Telegram) или список обновлений.
+Секрет берётся из WEBHOOK_SECRET.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+from aiohttp import ClientSession
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import WEBHOOK_PATH, WEBHOOK_SECRET, WEB_PORT  # noqa: E402
+
+
+def load_updates(paths):
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        yield from (data if isinstance(data, list) else [data])
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="JSON-файлы с обновлениями")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{WEB_PORT}{WEBHOOK_PATH}")
+    parser.add_argument("--repeat", type=int, default=1, help="сколько раз отправить каждое обновление")
+    args = parser.parse_args()
+
+    updates = list(load_updates(args.files))
+    headers = {"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET} if WEBHOOK_SECRET else {}
+
+    started = time.perf_counter()
+    async with ClientSession(headers=headers) as session:
+        for i in range(args.repeat):
+            for update in updates:
+                # update_id должен быть уникальным, иначе это «повторная доставка»
+                payload = dict(update, update_id=update.get("update_id", 0) + i)
+                async with session.post(args.url, json=payload) as resp:
+                    if resp.status != 200:
+                        print(f"update {payload['update_id']}: HTTP {resp.status} {await resp.text()}")
+
+    total = len(updates) * args.repeat
+    elapsed = time.perf_counter() - started
+    print(f"sent {total} updates in {elapsed:.2f}s ({total / elapsed:.1f} upd/s)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Tuple
+
+from config import ARCHIVE_KEEP_DAYS, ARCHIVE_BATCH_SIZE
+from database import connect
+
+
+async def archive_past(keep_days: int = ARCHIVE_KEEP_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE) -> Tuple[int, int]:
+    """Перенос прошедших записей и слотов в архивные таблицы
+
+    Слоты старше keep_days дней переносятся пачками по batch_size вместе
+    с записями, которые на них ссылаются. Каждая пачка — отдельная короткая
+    транзакция, чтобы не держать блокировку записи надолго.
+
+    Returns:
+        moved_bookings: Сколько записей перенесено
+        moved_slots: Сколько слотов перенесено
+    """
+    border = (datetime.now() - timedelta(days=keep_days)).isoformat()
+    archived_at = datetime.now().isoformat(timespec="seconds")
+    moved_bookings = 0
+    moved_slots = 0
+
+    async with connect() as db:
+        while True:
+            try:
+                await db.execute("BEGIN IMMEDIATE")
+
+                cur = await db.execute(
+                    "SELECT id FROM timeslots WHERE dt < ? ORDER BY dt LIMIT ?",
+                    (border, batch_size)
+                )
+                slot_ids = [row[0] for row in await cur.fetchall()]
+                if not slot_ids:
+                    await db.rollback()
+                    break
+
+                placeholders = ",".join("?" * len(slot_ids))
+
+                cur = await db.execute(f"""
+                    INSERT OR REPLACE INTO bookings_archive(
+                        id, user_id, timeslot_id, total_price, created_at,
+                        reminded24, reminded12, reminded1h, confirmed, archived_at
+                    )
+                    SELECT id, user_id, timeslot_id, total_price, created_at,
+                           reminded24, reminded12, reminded1h, confirmed, ?
+                    FROM bookings
+                    WHERE timeslot_id IN ({placeholders})
+                """, (archived_at, *slot_ids))
+                moved_bookings += cur.rowcount
+                await db.execute(f"DELETE FROM bookings WHERE timeslot_id IN ({placeholders})", slot_ids)
+
+                cur = await db.execute(f"""
+                    INSERT OR REPLACE INTO timeslots_archive(id, dt, is_booked, booked_by_user_id, archived_at)
+                    SELECT id, dt, is_booked, booked_by_user_id, ?
+                    FROM timeslots
+                    WHERE id IN ({placeholders})
+                """, (archived_at, *slot_ids))
+                moved_slots += cur.rowcount
+                await db.execute(f"DELETE FROM timeslots WHERE id IN ({placeholders})", slot_ids)
+
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+        # Возвращаем освободившиеся страницы и обновляем статистику планировщика
+        cur = await db.execute("PRAGMA incremental_vacuum")
+        await cur.fetchall()
+        cur = await db.execute("PRAGMA optimize")
+        await cur.fetchall()
+
+    logging.info("[archive] moved bookings=%s slots=%s (older than %s)", moved_bookings, moved_slots, border)
+    return moved_bookings, moved_slots
+
+
+async def incremental_vacuum():
+    """Вернуть свободные страницы файла БД после удалений"""
+    async with connect() as db:
+        cur = await db.execute("PRAGMA incremental_vacuum")
+        await cur.fetchall()
@@ -1,7 +1,6 @@
 import calendar
-import aiosqlite
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-from config import DB_PATH
+from database import connect
 
 
 async def build_calendar(year: int, month: int) -> InlineKeyboardMarkup:
@@ -18,7 +17,7 @@ async def build_calendar(year: int, month: int) -> InlineKeyboardMarkup:
     kb.append([InlineKeyboardButton(text=d, callback_data="ignore") for d in week_days])
 
     # Соберём инфу о доступных слотах
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect() as db:
         cur = await db.execute(
             """
             SELECT date(dt) as d, COUNT(*) 
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, Set
+
+from aiogram.exceptions import TelegramBadRequest
+
+from utils import metrics
+
+EDITS_TOTAL = metrics.register(metrics.Counter(
+    "bot_coalesced_edits_total", "Отложенные правки сообщений", ("result",)))
+
+
+class EditCoalescer:
+    """Склейка частых правок одного сообщения
+
+    Состояние меняется сразу, а edit_text откладывается на delay секунд:
+    если за это время пришла новая правка того же сообщения, уходит только
+    последняя. Одновременно по сообщению идёт не больше одной правки; то,
+    что пришло во время отправки, уйдёт следующим заходом.
+    """
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._pending: Dict[Hashable, Callable[[], Awaitable]] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._sending: Set[Hashable] = set()
+
+    def schedule(self, key: Hashable, render: Callable[[], Awaitable]):
+        """Запланировать отрисовку; предыдущая неотправленная отбрасывается"""
+        if key in self._pending:
+            EDITS_TOTAL.inc("skipped")
+        self._pending[key] = render
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._run(key))
+
+    async def cancel(self, key: Hashable):
+        """Забыть неотправленную правку и дождаться уже отправляемой
+
+        Вызывать перед тем, как сообщение правится «мимо» склейки, иначе
+        запоздалая правка может затереть новое содержимое.
+        """
+        if self._pending.pop(key, None) is not None:
+            EDITS_TOTAL.inc("skipped")
+        task = self._tasks.get(key)
+        if task is None:
+            return
+        if key not in self._sending:
+            # Спящую задачу снимаем сразу: schedule() до её завершения заведёт новую
+            del self._tasks[key]
+            task.cancel()
+        # Дожидаемся завершения: следующий schedule() для этого сообщения
+        # заведёт новую задачу, а не попадёт в уходящую
+        await asyncio.wait([task])
+
+    async def _run(self, key: Hashable):
+        try:
+            while key in self._pending:
+                await asyncio.sleep(self.delay)
+                render = self._pending.pop(key, None)
+                if render is None:
+                    break
+                self._sending.add(key)
+                try:
+                    await render()
+                    EDITS_TOTAL.inc("sent")
+                except TelegramBadRequest as e:
+                    # Выбор вернулся к уже показанному — править нечего
+                    if "message is not modified" in str(e):
+                        EDITS_TOTAL.inc("not_modified")
+                    else:
+                        EDITS_TOTAL.inc("failed")
+                        logging.warning("[coalesce] cannot edit message: %s", e)
+                except Exception as e:
+                    EDITS_TOTAL.inc("failed")
+                    logging.warning("[coalesce] cannot edit message: %s", e)
+                finally:
+                    self._sending.discard(key)
+        finally:
+            if self._tasks.get(key) is asyncio.current_task():
+                del self._tasks[key]
+
+    def __len__(self) -> int:
+        return len(self._tasks)
@@ -0,0 +1,19 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, List
+
+
+async def fanout(*calls: Awaitable, label: str = "fanout") -> List[Any]:
+    """Выполнить независимые вызовы (Telegram API и т.п.) одновременно
+
+    Обработчик ждёт самый долгий вызов, а не сумму всех. Ошибка одного
+    вызова не мешает остальным: она пишется в лог и возвращается на его
+    месте в списке результатов.
+    """
+    # Методы aiogram (call.answer(), message.edit_text()) — не корутины,
+    # а awaitable-модели: оборачиваем их в задачи сами
+    results = await asyncio.gather(*map(asyncio.ensure_future, calls), return_exceptions=True)
+    for index, result in enumerate(results):
+        if isinstance(result, Exception):
+            logging.warning("[%s] call #%d failed: %s: %s", label, index, type(result).__name__, result)
+    return results
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import os
+import time
+import tracemalloc
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+from aiogram import Bot
+
+from config import ADMIN_ID, HEALTH_LAG_ALERT_MS, HEALTH_ALERT_COOLDOWN
+from utils import metrics
+
+# Период таймера, по которому меряется задержка цикла событий
+CHECK_INTERVAL = 0.5
+# Сколько последних замеров хранить (минута при CHECK_INTERVAL = 0.5)
+LAG_WINDOW = 120
+
+STARTED_AT = time.time()
+
+_lags: deque = deque(maxlen=LAG_WINDOW)
+_last_tick = 0.0
+_last_alert = 0.0
+_ready = False
+
+# Размеры кэшей и хранилищ состояния: имя -> функция без аргументов
+_sizes: Dict[str, Callable[[], int]] = {}
+
+LOOP_LAG_SECONDS = metrics.register(metrics.Histogram(
+    "bot_event_loop_lag_seconds", "Опоздание таймера цикла событий",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)))
+
+
+def register_size(name: str, fn: Callable[[], int]):
+    """Показывать размер кэша/состояния в /debug_health и /health"""
+    _sizes[name] = fn
+
+
+def set_ready(ready: bool = True):
+    """Бот готов принимать обновления (после инициализации БД и обработчиков)"""
+    global _ready
+    _ready = ready
+
+
+def loop_lag() -> float:
+    """Последняя задержка цикла, секунды"""
+    return _lags[-1] if _lags else 0.0
+
+
+def max_loop_lag() -> float:
+    return max(_lags, default=0.0)
+
+
+def task_count() -> int:
+    return len(asyncio.all_tasks())
+
+
+def rss_bytes() -> int:
+    """Текущий RSS процесса (на Linux — из /proc, иначе пиковый из getrusage)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def sizes() -> Dict[str, int]:
+    result = {}
+    for name, fn in _sizes.items():
+        try:
+            result[name] = fn()
+        except Exception:
+            result[name] = -1
+    return result
+
+
+def is_alive() -> bool:
+    """Цикл событий крутится: таймер монитора срабатывал недавно"""
+    return time.monotonic() - _last_tick < CHECK_INTERVAL * 10 if _last_tick else True
+
+
+def snapshot() -> dict:
+    return {
+        "ready": _ready,
+        "alive": is_alive(),
+        "uptime_s": round(time.time() - STARTED_AT),
+        "loop_lag_ms": round(loop_lag() * 1000, 1),
+        "loop_lag_max_ms": round(max_loop_lag() * 1000, 1),
+        "tasks": task_count(),
+        "rss_mb": round(rss_bytes() / 2**20, 1),
+        "tracemalloc": tracemalloc.is_tracing(),
+        "sizes": sizes(),
+    }
+
+
+# ===== TRACEMALLOC (по запросу: заметно замедляет аллокации) =====
+
+def start_tracemalloc(frames: int = 1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop_tracemalloc():
+    tracemalloc.stop()
+
+
+def top_allocations(limit: int = 10) -> List[str]:
+    """Места с наибольшим объёмом живых аллокаций с момента start_tracemalloc"""
+    if not tracemalloc.is_tracing():
+        return []
+    stats = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    )).statistics("lineno")
+    return [
+        f"{stat.size / 1024:.0f} KiB, {stat.count} объектов — "
+        f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}"
+        for stat in stats[:limit]
+    ]
+
+
+# ===== МОНИТОР =====
+
+async def _alert(bot: Bot, lag: float):
+    global _last_alert
+    now = time.monotonic()
+    if now - _last_alert < HEALTH_ALERT_COOLDOWN:
+        return
+    _last_alert = now
+    try:
+        await bot.send_message(
+            ADMIN_ID,
+            f"⚠️ Цикл событий бота тормозит: задержка {lag * 1000:.0f} мс "
+            f"(порог {HEALTH_LAG_ALERT_MS} мс), задач: {task_count()}.\n"
+            f"Подробности: /debug_health"
+        )
+    except Exception as e:
+        logging.warning("Cannot send health alert: %s", e)
+
+
+async def monitor(bot: Optional[Bot] = None):
+    """Фоновая задача: задержка цикла по опозданию таймера, алерты админу"""
+    global _last_tick
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + CHECK_INTERVAL
+        await asyncio.sleep(CHECK_INTERVAL)
+        lag = max(0.0, loop.time() - expected)
+        _last_tick = time.monotonic()
+        _lags.append(lag)
+        LOOP_LAG_SECONDS.observe(lag)
+
+        if lag * 1000 >= HEALTH_LAG_ALERT_MS:
+            logging.warning("[health] event loop lag %.0f ms, tasks=%d", lag * 1000, task_count())
+            if bot and ADMIN_ID:
+                await _alert(bot, lag)
+
+
+metrics.register(metrics.Gauge("bot_event_loop_lag_max_seconds", "Максимальная задержка цикла за минуту", max_loop_lag))
+metrics.register(metrics.Gauge("bot_asyncio_tasks", "Живые задачи asyncio", task_count))
+metrics.register(metrics.Gauge("bot_process_rss_bytes", "RSS процесса", rss_bytes))
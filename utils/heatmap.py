@@ -0,0 +1,75 @@
+from datetime import date
+from typing import List, Tuple
+
+from database import connect
+
+WEEKDAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+# Градации загрузки: <25%, <50%, <75%, остальное
+SHADES = ["░", "▒", "▓", "█"]
+
+
+async def occupancy_grid(date_from: date, date_to: date) -> List[List[Tuple[int, int]]]:
+    """Загрузка по (день недели × час) за период [date_from, date_to)
+
+    Один агрегирующий запрос по всем слотам, включая архив.
+
+    Returns:
+        Матрица 7×24 из пар (занято, предложено), понедельник — строка 0
+    """
+    grid = [[(0, 0)] * 24 for _ in range(7)]
+
+    async with connect() as db:
+        cur = await db.execute("""
+            SELECT
+                (CAST(strftime('%w', dt) AS INTEGER) + 6) % 7 AS dow,
+                CAST(strftime('%H', dt) AS INTEGER) AS hour,
+                SUM(is_booked),
+                COUNT(*)
+            FROM timeslots_all
+            WHERE dt >= ? AND dt < ?
+            GROUP BY dow, hour
+        """, (date_from.isoformat(), date_to.isoformat()))
+
+        for dow, hour, booked, offered in await cur.fetchall():
+            grid[dow][hour] = (booked or 0, offered)
+
+    return grid
+
+
+def render_heatmap(grid: List[List[Tuple[int, int]]]) -> str:
+    """Текстовая сетка загрузки (для моноширинного блока)
+
+    Показываются только часы, в которые вообще были окна.
+    """
+    hours = [h for h in range(24) if any(grid[d][h][1] for d in range(7))]
+    if not hours:
+        return ""
+
+    lines = ["   " + "".join(f"{h:>3}" for h in hours)]
+    for dow, day_name in enumerate(WEEKDAYS):
+        cells = []
+        for h in hours:
+            booked, offered = grid[dow][h]
+            if not offered:
+                cells.append("  ·")
+            else:
+                ratio = booked / offered
+                cells.append("  " + SHADES[min(int(ratio * len(SHADES)), len(SHADES) - 1)])
+        lines.append(f"{day_name} " + "".join(cells))
+
+    lines.append("")
+    lines.append("· нет окон  ░ <25%  ▒ <50%  ▓ <75%  █ ≥75%")
+    return "\n".join(lines)
+
+
+def top_cells(grid: List[List[Tuple[int, int]]], count: int = 5) -> List[Tuple[str, int, float]]:
+    """Самые загруженные (день, час) — [(день, час, доля занятых)]"""
+    cells = [
+        (WEEKDAYS[dow], hour, booked / offered)
+        for dow, row in enumerate(grid)
+        for hour, (booked, offered) in enumerate(row)
+        if offered
+    ]
+    cells.sort(key=lambda c: c[2], reverse=True)
+    return cells[:count]
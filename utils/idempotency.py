@@ -0,0 +1,100 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Optional
+
+from aiogram.methods import AnswerCallbackQuery
+from aiogram.types import CallbackQuery
+
+from config import IDEMPOTENCY_TTL
+from utils import metrics
+from utils.health import register_size
+
+REPEATS_TOTAL = metrics.register(metrics.Counter(
+    "bot_idempotent_repeats_total", "Повторные нажатия, отвеченные из кэша", ("handler",)))
+
+
+class _Result:
+    """Итог обработки нажатия: ответ на callback для повторов"""
+    __slots__ = ("expires", "done", "text", "show_alert")
+
+    def __init__(self, expires: float):
+        self.expires = expires
+        self.done = asyncio.Event()
+        self.text: Optional[str] = None
+        self.show_alert: Optional[bool] = None
+
+
+# (tg_id, callback_data, message_id) -> итог
+_results: Dict[tuple, _Result] = {}
+_swept = 0.0
+# Итог нажатия, которое сейчас обрабатывается (для remember_answer)
+_current: ContextVar[Optional[_Result]] = ContextVar("idempotency_current", default=None)
+
+register_size("idempotency_keys", lambda: len(_results))
+
+
+def _sweep(now: float):
+    global _swept
+    _swept = now
+    for key in [key for key, result in _results.items() if result.expires <= now and result.done.is_set()]:
+        del _results[key]
+
+
+def remember_answer(method: AnswerCallbackQuery):
+    """Запомнить ответ обработчика на нажатие (вызывается из middleware сессии)"""
+    result = _current.get()
+    if result is not None:
+        result.text = method.text
+        result.show_alert = method.show_alert
+
+
+def retryable():
+    """Не кэшировать текущий итог: повтор снова выполнит обработчик
+
+    Для ошибок и отказов («слот занят», «попробуй ещё раз»), после которых
+    клиент может выбрать другое время в том же сообщении и нажать снова.
+    """
+    result = _current.get()
+    if result is not None:
+        result.expires = 0
+
+
+def idempotent(handler):
+    """Повтор того же нажатия в течение IDEMPOTENCY_TTL не выполняет обработчик
+
+    Двойное нажатие или повторная доставка от Telegram получает тот же ответ
+    на callback, что и первое нажатие, без BEGIN IMMEDIATE и без повторных
+    уведомлений мастеру. Ключ — (пользователь, callback_data, сообщение).
+    Если первое нажатие ещё обрабатывается, повтор дожидается его итога.
+    """
+
+    @wraps(handler)
+    async def wrapper(call: CallbackQuery, *args, **kwargs):
+        now = time.monotonic()
+        if now - _swept >= IDEMPOTENCY_TTL:
+            _sweep(now)
+
+        key = (call.from_user.id, call.data, call.message.message_id if call.message else None)
+        result = _results.get(key)
+        if result is not None and not result.done.is_set():
+            await result.done.wait()
+        if result is not None and result.expires > time.monotonic():
+            REPEATS_TOTAL.inc(handler.__name__)
+            return await call.answer(result.text, show_alert=result.show_alert)
+
+        result = _results[key] = _Result(now + IDEMPOTENCY_TTL)
+        token = _current.set(result)
+        try:
+            return await handler(call, *args, **kwargs)
+        except BaseException:
+            result.expires = 0
+            raise
+        finally:
+            _current.reset(token)
+            if not result.expires and _results.get(key) is result:
+                del _results[key]
+            result.done.set()
+
+    return wrapper
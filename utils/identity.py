@@ -0,0 +1,96 @@
+import aiosqlite
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from config import IDENTITY_CACHE_SIZE
+from database import connect
+from utils.health import register_size
+
+
+class Identity(NamedTuple):
+    """Пользователь в БД"""
+    id: int
+    phone: Optional[str]
+    name: Optional[str]
+
+
+# LRU-кэш tg_id -> Identity (только для известных пользователей)
+_cache: "OrderedDict[int, Identity]" = OrderedDict()
+
+
+def _remember(tg_id: int, identity: Identity):
+    _cache[tg_id] = identity
+    _cache.move_to_end(tg_id)
+    while len(_cache) > IDENTITY_CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+def forget(tg_id: int):
+    """Убрать пользователя из кэша (после изменения users в обход этого модуля)"""
+    _cache.pop(tg_id, None)
+
+
+def cache_size() -> int:
+    return len(_cache)
+
+
+register_size("identity_cache", cache_size)
+
+
+async def _load(db: aiosqlite.Connection, tg_id: int) -> Optional[Identity]:
+    cur = await db.execute("SELECT id, phone, name FROM users WHERE tg_id=?", (tg_id,))
+    row = await cur.fetchone()
+    if not row:
+        return None
+    identity = Identity(*row)
+    _remember(tg_id, identity)
+    return identity
+
+
+async def get_identity(tg_id: int) -> Optional[Identity]:
+    """Найти пользователя по tg_id (None — ещё не регистрировался)"""
+    identity = _cache.get(tg_id)
+    if identity:
+        _cache.move_to_end(tg_id)
+        return identity
+
+    async with connect() as db:
+        return await _load(db, tg_id)
+
+
+async def ensure_user(tg_id: int, name: str) -> Identity:
+    """Получить пользователя, зарегистрировав при первом обращении
+
+    Известные пользователи отдаются из кэша без записи в БД.
+    """
+    identity = await get_identity(tg_id)
+    if identity:
+        return identity
+
+    async with connect() as db:
+        await db.execute(
+            "INSERT OR IGNORE INTO users(tg_id, name) VALUES (?, ?)",
+            (tg_id, name)
+        )
+        await db.commit()
+        return await _load(db, tg_id)
+
+
+async def unblock(tg_id: int):
+    """Вернуть пользователя в рассылки: раз он пишет боту, блокировка снята"""
+    async with connect() as db:
+        await db.execute("UPDATE users SET is_blocked=0 WHERE tg_id=? AND is_blocked=1", (tg_id,))
+        await db.commit()
+
+
+async def set_phone(tg_id: int, name: str, phone: str) -> Identity:
+    """Сохранить телефон пользователя и обновить кэш"""
+    identity = await ensure_user(tg_id, name)
+
+    async with connect() as db:
+        await db.execute("UPDATE users SET phone=? WHERE id=?", (phone, identity.id))
+        await db.commit()
+
+    identity = identity._replace(phone=phone)
+    _remember(tg_id, identity)
+    return identity
@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+from typing import Awaitable, Callable, Optional
+
+from config import LEADER_LEASE_SECONDS
+from database import connect
+
+LEASE_NAME = "scheduler"
+
+# Уникальный идентификатор этого экземпляра бота
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+_is_leader = False
+
+
+def is_leader() -> bool:
+    return _is_leader
+
+
+async def try_acquire() -> bool:
+    """Взять или продлить аренду лидерства
+
+    Аренда переходит к другому экземпляру, только если текущий держатель
+    не продлевал её дольше LEADER_LEASE_SECONDS (упал или завис).
+    """
+    global _is_leader
+    now = time.time()
+
+    async with connect() as db:
+        await db.execute("""
+            INSERT INTO leader_lease(name, holder, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT(name) DO UPDATE
+                SET holder = excluded.holder, expires_at = excluded.expires_at
+                WHERE leader_lease.holder = excluded.holder OR leader_lease.expires_at < ?
+        """, (LEASE_NAME, INSTANCE_ID, now + LEADER_LEASE_SECONDS, now))
+        await db.commit()
+
+        cur = await db.execute("SELECT holder FROM leader_lease WHERE name=?", (LEASE_NAME,))
+        holder = (await cur.fetchone())[0]
+
+    was_leader = _is_leader
+    _is_leader = holder == INSTANCE_ID
+    if _is_leader != was_leader:
+        logging.info("[leader] %s %s", INSTANCE_ID, "became leader" if _is_leader else "lost leadership")
+    return _is_leader
+
+
+async def release():
+    """Отдать аренду при штатной остановке (другой экземпляр подхватит сразу)"""
+    global _is_leader
+    async with connect() as db:
+        await db.execute("DELETE FROM leader_lease WHERE name=? AND holder=?", (LEASE_NAME, INSTANCE_ID))
+        await db.commit()
+    _is_leader = False
+
+
+async def heartbeat(on_elected: Optional[Callable[[], Awaitable[None]]] = None):
+    """Фоновое продление аренды; on_elected вызывается при получении лидерства"""
+    while True:
+        was_leader = _is_leader
+        try:
+            if await try_acquire() and not was_leader and on_elected:
+                await on_elected()
+        except Exception as e:
+            logging.warning("[leader] heartbeat failed: %s", e)
+        await asyncio.sleep(LEADER_LEASE_SECONDS / 3)
+
+
+def leader_only(job: Callable[[], Awaitable[None]]) -> Callable[[], Awaitable[None]]:
+    """Обёртка для крон-задачи: выполняется только на лидере"""
+    async def wrapper():
+        # Продлеваем аренду прямо перед запуском, чтобы не работать по устаревшему статусу
+        if not await try_acquire():
+            return
+        await job()
+    return wrapper
@@ -0,0 +1,130 @@
+import atexit
+import json
+import logging
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from config import LOG_LEVEL, LOG_FORMAT, LOG_SAMPLING
+from utils import metrics
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_listener: Optional[QueueListener] = None
+
+
+class UpdateContextFilter(logging.Filter):
+    """Добавить к записи update_id и обработчик текущего обновления
+
+    Работает в потоке, который пишет в лог (contextvars видны только там).
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        stats = metrics.current_update.get()
+        record.update_id = stats.update_id if stats else None
+        record.handler = stats.handler if stats else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Прореживание болтливых модулей: из каждых N записей уровня INFO и ниже — одна
+
+    rates — доля записей по имени логгера или модуля (имени файла без .py),
+    например {"reminders": 0.1, "aiogram.event": 0.01}. Предупреждения и
+    ошибки проходят всегда.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.every = {name: max(1, round(1 / rate)) for name, rate in rates.items() if rate > 0}
+        self.dropped = {name for name, rate in rates.items() if rate <= 0}
+        self.counts: Dict[str, int] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO:
+            return True
+        key = record.name if record.name in self.every or record.name in self.dropped else record.module
+        if key in self.dropped:
+            return False
+        every = self.every.get(key)
+        if every is None:
+            return True
+        count = self.counts[key] = self.counts.get(key, 0) + 1
+        return (count - 1) % every == 0
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON"""
+
+    def __init__(self, worker: Optional[int] = None):
+        super().__init__()
+        self.worker = worker
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "msg": record.getMessage(),
+        }
+        if self.worker is not None:
+            data["worker"] = self.worker
+        if getattr(record, "update_id", None) is not None:
+            data["update_id"] = record.update_id
+            data["handler"] = record.handler
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def parse_sampling(value: str) -> Dict[str, float]:
+    """'reminders=0.1,aiogram.event=0.01' -> {'reminders': 0.1, 'aiogram.event': 0.01}"""
+    rates = {}
+    for item in value.split(","):
+        name, _, rate = item.partition("=")
+        if name.strip() and rate.strip():
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(worker: Optional[int] = None):
+    """Логирование через очередь: вызовы logging только кладут запись в очередь,
+    а форматирование и запись в поток вывода идут в отдельном потоке
+
+    Так медленный диск или переполненный pipe не задерживают цикл событий.
+    LOG_FORMAT=json — по строке JSON на запись (с update_id и обработчиком),
+    text — прежний человекочитаемый формат.
+    """
+    global _listener
+    stop_logging()
+
+    output = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter(worker))
+    else:
+        prefix = f"worker{worker} - " if worker is not None else ""
+        output.setFormatter(logging.Formatter(TEXT_FORMAT.replace("%(name)s", prefix + "%(name)s")))
+
+    records = queue.SimpleQueue()
+    handler = QueueHandler(records)
+    handler.addFilter(UpdateContextFilter())
+    if LOG_SAMPLING:
+        handler.addFilter(SamplingFilter(parse_sampling(LOG_SAMPLING)))
+
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+
+    _listener = QueueListener(records, output)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Дописать очередь и остановить поток записи"""
+    global _listener
+    listener, _listener = _listener, None
+    if listener:
+        listener.stop()
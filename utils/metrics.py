@@ -0,0 +1,164 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Границы корзин гистограмм задержек (секунды)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Границы корзин для количеств (запросов к БД за обновление и т.п.)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Counter:
+    """Счётчик Prometheus с метками"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, value: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self.values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Гистограмма Prometheus с метками (корзины хранятся не накопительно)"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # метки -> [счётчики по корзинам (+Inf последним), сумма, количество]
+        self.values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(
+                    f"{self.name}_bucket{_labels(self.labelnames + ('le',), labels + (le,))} {cumulative}"
+                )
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Gauge:
+    """Текущее значение, вычисляемое в момент выдачи метрик"""
+
+    def __init__(self, name: str, help_text: str, fn: Callable[[], float]):
+        self.name = name
+        self.help = help_text
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.fn()}"]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+# ===== Метрики бота =====
+
+REGISTRY: List = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+UPDATE_SECONDS = register(Histogram(
+    "bot_update_duration_seconds", "Время обработки обновления", ("event", "handler")))
+UPDATES_TOTAL = register(Counter(
+    "bot_updates_total", "Обработанные обновления", ("event", "handler", "status")))
+UPDATE_DB_SECONDS = register(Histogram(
+    "bot_update_db_seconds", "Время в SQLite за одно обновление", ("handler",)))
+UPDATE_API_SECONDS = register(Histogram(
+    "bot_update_api_seconds", "Время в Telegram API за одно обновление", ("handler",)))
+UPDATE_QUERIES = register(Histogram(
+    "bot_update_db_queries", "Запросов к SQLite за одно обновление", ("handler",), COUNT_BUCKETS))
+DB_CALL_SECONDS = register(Histogram(
+    "bot_db_call_seconds", "Время одного обращения к SQLite", ()))
+API_REQUEST_SECONDS = register(Histogram(
+    "bot_api_request_seconds", "Время запроса к Telegram API", ("method",)))
+API_ERRORS_TOTAL = register(Counter(
+    "bot_api_errors_total", "Ошибки запросов к Telegram API", ("method",)))
+UPDATES_DROPPED = register(Counter(
+    "bot_updates_dropped_total", "Отброшенные без обработки обновления", ("event", "reason")))
+WORKER_RESTARTS = register(Counter(
+    "bot_worker_restarts_total", "Перезапуски упавших процессов-воркеров", ("worker",)))
+USER_QUEUE_WAIT_SECONDS = register(Histogram(
+    "bot_user_queue_wait_seconds", "Ожидание своей очереди обновлением пользователя", ()))
+
+
+class UpdateStats:
+    """Учёт одного обновления: обработчик и время во внешних системах"""
+    __slots__ = ("update_id", "handler", "db_seconds", "api_seconds", "queries")
+
+    def __init__(self, update_id: Optional[int] = None):
+        self.update_id = update_id
+        self.handler = "unhandled"
+        self.db_seconds = 0.0
+        self.api_seconds = 0.0
+        self.queries = 0
+
+
+# Учёт текущего обновления (None — код вне обработки обновлений, например крон)
+current_update: ContextVar[Optional[UpdateStats]] = ContextVar("current_update", default=None)
+
+
+def current_handler() -> str:
+    stats = current_update.get()
+    return stats.handler if stats else "background"
+
+
+def observe_db(seconds: float):
+    DB_CALL_SECONDS.observe(seconds)
+    stats = current_update.get()
+    if stats:
+        stats.db_seconds += seconds
+
+
+def observe_api(method: str, seconds: float, failed: bool):
+    API_REQUEST_SECONDS.observe(seconds, method)
+    if failed:
+        API_ERRORS_TOTAL.inc(method)
+    stats = current_update.get()
+    if stats:
+        stats.api_seconds += seconds
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,169 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Функции из этих каталогов считаются «областью» (обработчик, крон-задача)
+SCOPE_DIRS = tuple(os.path.join(ROOT, name) + os.sep for name in ("handlers", "keyboards", "utils"))
+# ...кроме служебных обёрток, через которые вызываются обработчики и задачи
+SCOPE_EXCLUDED = frozenset(os.path.join(ROOT, folder, name) for folder, name in (
+    ("utils", "leader.py"),
+    ("utils", "profiler.py"),
+    ("utils", "metrics.py"),
+    ("utils", "idempotency.py"),
+    ("handlers", "menu.py"),
+))
+
+IDLE = "(idle)"
+
+_names: Dict[object, str] = {}
+_scopes: Dict[object, bool] = {}
+_packages: Dict[object, str] = {}
+
+
+def _frame_name(code) -> str:
+    name = _names.get(code)
+    if name is None:
+        path = code.co_filename
+        short = os.path.relpath(path, ROOT) if path.startswith(ROOT) else os.path.basename(path)
+        name = _names[code] = f"{code.co_name} ({short})"
+    return name
+
+
+def _package(code) -> str:
+    """Библиотека, в которой исполняется код: (aiogram), (pydantic), (asyncio)..."""
+    package = _packages.get(code)
+    if package is None:
+        path = code.co_filename
+        if "site-packages" in path:
+            package = path.split("site-packages", 1)[1].strip(os.sep).split(os.sep)[0]
+        elif path.startswith(ROOT):
+            package = os.path.relpath(path, ROOT).split(os.sep)[0]
+        else:
+            parent = os.path.basename(os.path.dirname(path))
+            package = parent if parent and not parent.startswith("python") else os.path.basename(path)
+        package = _packages[code] = f"({package.removesuffix('.py')})"
+    return package
+
+
+def _is_scope(code) -> bool:
+    scope = _scopes.get(code)
+    if scope is None:
+        path = code.co_filename
+        scope = _scopes[code] = path.startswith(SCOPE_DIRS) and path not in SCOPE_EXCLUDED
+    return scope
+
+
+class SamplingProfiler:
+    """Сэмплирующий профилировщик потока событийного цикла
+
+    Отдельный поток раз в interval секунд снимает стек потока цикла
+    (sys._current_frames) и относит его к самому внешнему вызову из
+    handlers/, keyboards/ или utils/ — обработчику обновления или
+    крон-задаче, а вне их — к библиотеке, где исполняется код. Видно
+    только время на CPU в цикле: ожидание БД и Telegram API попадает
+    в (idle), его смотрите в /metrics.
+    """
+
+    def __init__(self, thread_id: int, interval: float, max_seconds: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.scopes: Counter = Counter()
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.timed_out = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    @property
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            if time.monotonic() >= deadline:
+                self.timed_out = True
+                break
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self._sample(frame)
+        self.finished_at = time.time()
+
+    def _sample(self, frame):
+        stack = []
+        scope = None
+        innermost = frame.f_code
+        while frame is not None:
+            code = frame.f_code
+            stack.append(_frame_name(code))
+            if _is_scope(code):
+                scope = code.co_name
+            frame = frame.f_back
+        stack.reverse()
+
+        if scope is None:
+            # Цикл ждёт событий в selectors.select — поток свободен;
+            # иначе это код библиотек вне обработчиков (роутинг aiogram и т.п.)
+            scope = IDLE if stack[-1].startswith("select (") else _package(innermost)
+        self.stacks[(scope,) + tuple(stack)] += 1
+        self.scopes[scope] += 1
+
+    @property
+    def duration(self) -> float:
+        return (self.finished_at or time.time()) - self.started_at
+
+    def collapsed(self) -> str:
+        """Стеки в формате collapsed (flamegraph.pl, speedscope): корень — обработчик"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self, limit: int = 10) -> str:
+        total = sum(self.scopes.values())
+        busy = total - self.scopes.get(IDLE, 0)
+        lines = [
+            f"Сэмплов: {total} за {self.duration:.0f} с"
+            + (" (остановлено по лимиту)" if self.timed_out else ""),
+            f"Цикл занят: {busy * 100 / total:.1f}%" if total else "Сэмплов нет",
+        ]
+        for scope, count in self.scopes.most_common(limit):
+            lines.append(f"{count * 100 / total:5.1f}%  {scope}")
+        return "\n".join(lines)
+
+
+_active: Optional[SamplingProfiler] = None
+
+
+def active() -> Optional[SamplingProfiler]:
+    return _active
+
+
+def start_profiling(interval: float, max_seconds: float) -> SamplingProfiler:
+    """Запустить профилирование текущего (событийного) потока"""
+    global _active
+    if _active and _active.running:
+        raise RuntimeError("Профилировщик уже запущен")
+    _active = SamplingProfiler(threading.get_ident(), interval, max_seconds)
+    _active.start()
+    return _active
+
+
+def stop_profiling() -> Optional[SamplingProfiler]:
+    """Остановить профилирование и вернуть результат (None, если не запускалось)"""
+    global _active
+    profiler, _active = _active, None
+    if profiler:
+        profiler.stop()
+    return profiler
@@ -0,0 +1,118 @@
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from config import SLOW_QUERY_MS
+from utils import metrics
+from utils.health import register_size
+
+# Сколько разных запросов хранить (остальные попадают в общий «прочие»)
+MAX_STATEMENTS = 500
+OTHER_STATEMENT = "<прочие запросы>"
+
+# Запросы, для которых имеет смысл EXPLAIN QUERY PLAN
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+# Тексты запросов в коде почти все константы — нормализуем каждый один раз
+_normalized: Dict[str, str] = {}
+
+
+def normalize(sql: str) -> str:
+    """Текст запроса без литералов и лишних пробелов (ключ статистики)"""
+    result = _normalized.get(sql)
+    if result is None:
+        result = _SPACE_RE.sub(" ", sql).strip()
+        result = _LITERAL_RE.sub("?", result)
+        result = _LIST_RE.sub("(?, ...)", result)
+        if len(_normalized) < MAX_STATEMENTS * 4:
+            _normalized[sql] = result
+    return result
+
+
+class QueryStat:
+    """Накопленная статистика одного нормализованного запроса"""
+    __slots__ = ("count", "seconds", "max_seconds", "rows", "handlers")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.handlers: Dict[str, int] = {}
+
+
+_stats: Dict[str, QueryStat] = {}
+register_size("querylog_statements", lambda: len(_stats))
+
+
+class QueryRecord:
+    """Одно выполнение запроса: время и строки копятся, пока читается курсор"""
+    __slots__ = ("sql", "params", "handler", "stat", "seconds", "rows", "logged")
+
+    def __init__(self, sql: str, params, handler: str, stat: QueryStat):
+        self.sql = sql
+        self.params = params
+        self.handler = handler
+        self.stat = stat
+        self.seconds = 0.0
+        self.rows = 0
+        self.logged = False
+
+    def add(self, seconds: float, rows: int) -> bool:
+        """Учесть шаг выполнения; True — запрос только что стал медленным"""
+        self.seconds += seconds
+        self.rows += rows
+        self.stat.seconds += seconds
+        self.stat.rows += rows
+        if self.seconds > self.stat.max_seconds:
+            self.stat.max_seconds = self.seconds
+        if not self.logged and self.seconds * 1000 >= SLOW_QUERY_MS:
+            self.logged = True
+            return True
+        return False
+
+    @property
+    def explainable(self) -> bool:
+        return self.sql.lstrip().upper().startswith(EXPLAINABLE)
+
+
+def start(sql: str, params) -> QueryRecord:
+    """Начать учёт выполнения запроса в текущем обработчике"""
+    key = normalize(sql)
+    stat = _stats.get(key)
+    if stat is None:
+        if len(_stats) >= MAX_STATEMENTS:
+            key = OTHER_STATEMENT
+            stat = _stats.get(key)
+        if stat is None:
+            stat = _stats[key] = QueryStat()
+
+    handler = metrics.current_handler()
+    stat.count += 1
+    stat.handlers[handler] = stat.handlers.get(handler, 0) + 1
+
+    update = metrics.current_update.get()
+    if update:
+        update.queries += 1
+    return QueryRecord(sql, params, handler, stat)
+
+
+def log_slow(record: QueryRecord, plan: Optional[List[str]]):
+    """Записать медленный запрос в лог вместе с планом выполнения"""
+    text = f"[slow query] {record.seconds * 1000:.1f} ms, rows={record.rows}, handler={record.handler}: {normalize(record.sql)}"
+    if plan:
+        text += "\n  " + "\n  ".join(plan)
+    logging.warning(text)
+
+
+def top(limit: int = 10) -> List[Tuple[str, QueryStat]]:
+    """Запросы с наибольшим суммарным временем"""
+    return sorted(_stats.items(), key=lambda item: item[1].seconds, reverse=True)[:limit]
+
+
+def reset():
+    _stats.clear()
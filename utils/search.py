@@ -0,0 +1,61 @@
+import re
+from typing import Dict, List, Optional
+
+from database import connect
+
+# Символы, которые встречаются в записи телефона
+_PHONE_CHARS = re.compile(r"[\s+()\-.]")
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """Запрос пользователя -> выражение FTS5 MATCH с поиском по префиксу
+
+    Номер телефона ищется по колонке phone как одна последовательность цифр,
+    остальное — по словам (все слова должны совпасть).
+    """
+    compact = _PHONE_CHARS.sub("", query)
+    if compact.isdigit():
+        return f'phone : "{compact}"*'
+
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+async def search_clients(query: str, limit: int = 10) -> List[Dict]:
+    """Поиск клиентов по имени/телефону вместе с их записями (один запрос)
+
+    Returns:
+        [{"id", "name", "phone", "bookings": [(booking_id, dt, total_price), ...]}]
+        в порядке релевантности, записи — от новых к старым.
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    async with connect() as db:
+        cur = await db.execute("""
+            WITH found AS (
+                SELECT rowid AS uid, rank
+                FROM users_fts
+                WHERE users_fts MATCH ?
+                ORDER BY rank
+                LIMIT ?
+            )
+            SELECT u.id, u.name, u.phone, b.id, t.dt, b.total_price
+            FROM found f
+            JOIN users u ON u.id = f.uid
+            LEFT JOIN bookings_all b ON b.user_id = u.id
+            LEFT JOIN timeslots_all t ON t.id = b.timeslot_id
+            ORDER BY f.rank, t.dt DESC
+        """, (match, limit))
+        rows = await cur.fetchall()
+
+    clients: Dict[int, Dict] = {}
+    for uid, name, phone, bid, dt_str, price in rows:
+        client = clients.setdefault(uid, {"id": uid, "name": name, "phone": phone, "bookings": []})
+        if bid is not None and dt_str is not None:
+            client["bookings"].append((bid, dt_str, price))
+
+    return list(clients.values())
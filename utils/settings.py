@@ -0,0 +1,99 @@
+from typing import Dict, Optional, Tuple
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from database import connect
+from utils.shard import publish
+from utils.health import register_size
+
+# Кэш таблицы settings: читается при старте, обновляется в save_setting
+_settings: Dict[str, str] = {}
+_loaded = False
+
+# Готовое сообщение «Контакты»: пересобирается только при изменении contact_*
+_contacts_message: Optional[Tuple[str, Optional[InlineKeyboardMarkup]]] = None
+register_size("settings_cache", lambda: len(_settings))
+
+
+async def load_settings():
+    """Загрузить все настройки из БД в кэш"""
+    global _loaded, _contacts_message
+    async with connect() as db:
+        cur = await db.execute("SELECT key, value FROM settings")
+        rows = await cur.fetchall()
+
+    _settings.clear()
+    _settings.update({key: value for key, value in rows})
+    _contacts_message = None
+    _loaded = True
+
+
+async def _ensure_loaded():
+    if not _loaded:
+        await load_settings()
+
+
+async def get_setting(key: str, default: Optional[str] = None) -> Optional[str]:
+    """Значение настройки из кэша"""
+    await _ensure_loaded()
+    return _settings.get(key, default)
+
+
+async def get_int_setting(key: str, default: int) -> int:
+    """Числовая настройка из кэша (default, если не задана или не число)"""
+    value = await get_setting(key)
+    try:
+        return int(value) if value is not None else default
+    except ValueError:
+        return default
+
+
+async def save_setting(key: str, value: str):
+    """Сохранить настройку в БД и сразу обновить кэш"""
+    global _contacts_message
+    await _ensure_loaded()
+    async with connect() as db:
+        await db.execute("""
+            INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)
+        """, (key, value))
+        await db.commit()
+
+    _settings[key] = value
+    if key.startswith("contact_"):
+        _contacts_message = None
+
+    # Другие процессы-воркеры перечитают настройки
+    publish("settings")
+
+
+def _render_contacts() -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Собрать текст и кнопки для «Контакты»"""
+    address = _settings.get('contact_address', 'Не указан')
+    phone = _settings.get('contact_phone', 'Не указан')
+    instagram = _settings.get('contact_instagram', '')
+    hours = _settings.get('contact_hours', 'Не указаны')
+    map_url = _settings.get('contact_map_url', '')
+
+    text = (
+        "📍 *Контакты и информация*\n\n"
+        f"🏠 Адрес: {address}\n"
+        f"📞 Телефон: {phone}\n"
+        f"🕐 Часы работы: {hours}\n"
+    )
+
+    kb_rows = []
+    if map_url:
+        kb_rows.append([InlineKeyboardButton(text="🗺 Как добраться", url=map_url)])
+    if instagram:
+        kb_rows.append([InlineKeyboardButton(text="📸 Instagram", url=instagram)])
+
+    kb = InlineKeyboardMarkup(inline_keyboard=kb_rows) if kb_rows else None
+    return text, kb
+
+
+async def get_contacts_message() -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+    """Готовое сообщение «Контакты» (текст, клавиатура) без обращения к БД"""
+    global _contacts_message
+    await _ensure_loaded()
+    if _contacts_message is None:
+        _contacts_message = _render_contacts()
+    return _contacts_message
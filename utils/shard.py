@@ -0,0 +1,31 @@
+from typing import Callable, Optional
+
+# Публикация «кэш устарел» в другие процессы-воркеры.
+# В однопроцессном режиме издателя нет и publish ничего не делает.
+_publisher: Optional[Callable[[str], None]] = None
+
+
+def set_publisher(publisher: Optional[Callable[[str], None]]):
+    """Назначить функцию рассылки инвалидаций (вызывается воркером при старте)"""
+    global _publisher
+    _publisher = publisher
+
+
+def publish(topic: str):
+    """Сообщить остальным процессам, что данные topic изменились"""
+    if _publisher:
+        _publisher(topic)
+
+
+def shard_key(update: dict) -> int:
+    """Ключ шардирования сырого обновления — id пользователя (или чата)
+
+    Все обновления одного пользователя попадают в один воркер, поэтому
+    его состояние записи (pending) живёт в памяти одного процесса.
+    """
+    for key, value in update.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        owner = value.get("from") or value.get("user") or value.get("chat") or {}
+        return int(owner.get("id", 0))
+    return 0
@@ -0,0 +1,49 @@
+import re
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from aiogram.filters import Filter
+from aiogram.types import Message
+
+TriggerHandler = Callable[[Message], Awaitable[Any]]
+
+
+class TriggerTable:
+    """Таблица текстовых триггеров: текст сообщения -> обработчик
+
+    Сначала точное совпадение (кнопки меню — один поиск в dict), затем
+    скомпилированные выражения в порядке добавления — первое совпавшее
+    побеждает. Команды ("/...") таблица не трогает.
+    """
+
+    def __init__(self):
+        self.exact: Dict[str, TriggerHandler] = {}
+        self.patterns: List[Tuple[re.Pattern, TriggerHandler]] = []
+
+    def add_exact(self, texts: Iterable[str], handler: TriggerHandler):
+        for text in texts:
+            self.exact[text] = handler
+
+    def add_pattern(self, pattern: str, handler: TriggerHandler, flags: int = 0):
+        self.patterns.append((re.compile(pattern, flags), handler))
+
+    def resolve(self, text: Optional[str]) -> Optional[TriggerHandler]:
+        if not text or text.startswith("/"):
+            return None
+        handler = self.exact.get(text)
+        if handler is not None:
+            return handler
+        for pattern, handler in self.patterns:
+            if pattern.search(text):
+                return handler
+        return None
+
+
+class TriggerFilter(Filter):
+    """Фильтр aiogram: найденный в таблице обработчик передаётся как trigger"""
+
+    def __init__(self, table: TriggerTable):
+        self.table = table
+
+    async def __call__(self, message: Message) -> Union[bool, Dict[str, Any]]:
+        handler = self.table.resolve(message.text)
+        return {"trigger": handler} if handler else False
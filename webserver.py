@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from typing import Optional
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+from config import BOT_MODE, WEBHOOK_PATH, WEBHOOK_SECRET, WEB_HOST, WEB_PORT, METRICS_HOST, HEALTH_LAG_ALERT_MS
+from database import connect
+from utils import health, metrics
+
+
+def build_app(dp: Dispatcher, bot: Bot, webhook_handler: Optional[web.RequestHandler] = None) -> web.Application:
+    """aiohttp-приложение бота: приём webhook от Telegram
+
+    webhook_handler заменяет стандартную обработку (например, маршрутизацию
+    обновлений по процессам-воркерам).
+    """
+    app = web.Application()
+
+    if BOT_MODE == "webhook" and webhook_handler:
+        app.router.add_post(WEBHOOK_PATH, webhook_handler)
+    elif BOT_MODE == "webhook":
+        # Проверяет X-Telegram-Bot-Api-Secret-Token, сразу отвечает 200
+        # и обрабатывает обновление в фоне — обновления идут параллельно
+        SimpleRequestHandler(
+            dispatcher=dp,
+            bot=bot,
+            handle_in_background=True,
+            secret_token=WEBHOOK_SECRET,
+        ).register(app, path=WEBHOOK_PATH)
+        # dp.startup / dp.shutdown — как при start_polling (при запуске и остановке приложения)
+        setup_application(app, dp, bot=bot)
+
+    return app
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(
+        body=metrics.render().encode(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+
+async def live_handler(request: web.Request) -> web.Response:
+    """Liveness: цикл событий не завис"""
+    snapshot = health.snapshot()
+    return web.json_response(snapshot, status=200 if snapshot["alive"] else 503)
+
+
+async def ready_handler(request: web.Request) -> web.Response:
+    """Readiness: бот инициализирован, цикл не тормозит, БД отвечает"""
+    snapshot = health.snapshot()
+    try:
+        async with connect() as db:
+            await asyncio.wait_for(db.execute("SELECT 1"), timeout=2)
+        snapshot["db"] = True
+    except Exception:
+        snapshot["db"] = False
+    ok = snapshot["ready"] and snapshot["alive"] and snapshot["db"] and snapshot["loop_lag_ms"] < HEALTH_LAG_ALERT_MS
+    return web.json_response(snapshot, status=200 if ok else 503)
+
+
+def build_metrics_app() -> web.Application:
+    """Отдельное приложение для /metrics и /health — слушает только локальный интерфейс"""
+    app = web.Application()
+    app.router.add_get("/metrics", metrics_handler)
+    app.router.add_get("/health/live", live_handler)
+    app.router.add_get("/health/ready", ready_handler)
+    return app
+
+
+async def start_webserver(app: web.Application, host: str = WEB_HOST, port: int = WEB_PORT) -> web.AppRunner:
+    """Запуск HTTP-сервера (остановка — await runner.cleanup())"""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logging.info("🌐 HTTP server listening on %s:%s", host, port)
+    return runner
+
+
+async def start_metrics_server(port: int) -> Optional[web.AppRunner]:
+    """Сервер метрик на METRICS_HOST:port (None, если метрики выключены)"""
+    if not port:
+        return None
+    return await start_webserver(build_metrics_app(), METRICS_HOST, port)
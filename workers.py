@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import multiprocessing
+import queue
+import secrets
+from typing import Awaitable, Callable, List, Set
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+
+from config import BOT_TOKEN, BOT_MODE, WORKERS, WEBHOOK_SECRET, METRICS_PORT
+from utils import metrics
+from utils.shard import shard_key, set_publisher
+
+# Максимум обновлений в очереди одного воркера
+INBOX_SIZE = 1000
+# Сколько фронт ждёт места в очереди воркера, прежде чем отбросить обновление (секунды)
+PUT_TIMEOUT = 1
+# Как часто проверять, что процессы-воркеры живы (секунды)
+SUPERVISE_INTERVAL = 5
+
+
+# ===== ВОРКЕР =====
+
+def worker_main(index: int, inbox: multiprocessing.Queue, control: multiprocessing.Queue):
+    """Точка входа процесса-воркера"""
+    from utils.logs import setup_logging, stop_logging
+
+    setup_logging(worker=index)
+    try:
+        asyncio.run(_worker(index, inbox, control))
+    finally:
+        # atexit в дочернем процессе multiprocessing не вызывается
+        stop_logging()
+
+
+async def _worker(index: int, inbox: multiprocessing.Queue, control: multiprocessing.Queue):
+    from handlers import register_handlers
+    from middlewares import setup_middlewares
+    from utils import health
+    from utils.settings import load_settings
+    from webserver import start_metrics_server
+
+    bot = Bot(BOT_TOKEN)
+    dp = Dispatcher()
+    register_handlers(dp)
+    setup_middlewares(dp, bot, worker=index)
+    await load_settings()
+
+    # У каждого воркера свои метрики: порт METRICS_PORT + 1 + номер воркера
+    metrics_runner = await start_metrics_server(METRICS_PORT + 1 + index if METRICS_PORT else 0)
+
+    # Изменения общих кэшей (настройки) рассылаются остальным воркерам через фронт
+    set_publisher(lambda topic: control.put((index, topic)))
+
+    health_monitor = asyncio.create_task(health.monitor(bot))
+    # Обработчики живут в воркерах: здесь и срабатывают dp.startup / dp.shutdown
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    health.set_ready()
+
+    tasks: Set[asyncio.Task] = set()
+    logging.info("worker%d ready", index)
+
+    while True:
+        item = await asyncio.to_thread(inbox.get)
+        if item is None:
+            break
+
+        kind, payload = item
+        if kind == "update":
+            task = asyncio.create_task(dp.feed_raw_update(bot, payload))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        elif kind == "invalidate" and payload == "settings":
+            await load_settings()
+
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    await dp.emit_shutdown(bot=bot, dispatcher=dp)
+    health_monitor.cancel()
+    if metrics_runner:
+        await metrics_runner.cleanup()
+    await bot.session.close()
+
+
+# ===== ФРОНТ: приём обновлений и маршрутизация =====
+
+class Shards:
+    """Процессы-воркеры и маршрутизация обновлений по пользователю"""
+
+    def __init__(self, count: int):
+        self.ctx = multiprocessing.get_context("spawn")
+        self.control = self.ctx.Queue()
+        self.inboxes: List[multiprocessing.Queue] = [self.ctx.Queue(INBOX_SIZE) for _ in range(count)]
+        self.processes = [self._spawn(i) for i in range(count)]
+        # Очередь воркера была полна при прошлой попытке — не ждём её снова
+        self.congested = [False] * count
+        self.stopping = False
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        return self.ctx.Process(
+            target=worker_main, args=(index, self.inboxes[index], self.control), name=f"worker{index}", daemon=True
+        )
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+
+    def ensure_alive(self, index: int) -> bool:
+        """Перезапустить упавший воркер с новой очередью
+
+        Старую очередь не переиспользуем: убитый процесс обычно ждал в
+        inbox.get() и унёс с собой её межпроцессную блокировку чтения —
+        новый воркер повис бы на ней навсегда. Необработанные обновления
+        из старой очереди теряются.
+
+        Returns:
+            True — воркер был мёртв и перезапущен
+        """
+        process = self.processes[index]
+        if self.stopping or process.is_alive():
+            return False
+        logging.error("worker%d died (exit code %s), restarting", index, process.exitcode)
+        metrics.WORKER_RESTARTS.inc(str(index))
+        stale = self.inboxes[index]
+        self.inboxes[index] = self.ctx.Queue(INBOX_SIZE)
+        self.congested[index] = False
+        # Фоновый поток старой очереди не должен держать фронт при выходе
+        stale.cancel_join_thread()
+        stale.close()
+        process = self.processes[index] = self._spawn(index)
+        process.start()
+        return True
+
+    async def supervise(self):
+        """Фоновая проверка воркеров: упавший перезапускается и без входящих обновлений"""
+        while not self.stopping:
+            await asyncio.sleep(SUPERVISE_INTERVAL)
+            for index in range(len(self.processes)):
+                self.ensure_alive(index)
+
+    async def _put(self, index: int, item) -> bool:
+        """Положить в очередь воркера; False — очередь полна, элемент отброшен
+
+        Фронт раздаёт обновления по одному: застрявший воркер не должен
+        останавливать обновления всех остальных пользователей. Места ждём
+        не дольше PUT_TIMEOUT и только если в прошлый раз очередь не была
+        полна — пока воркер не разгребётся, лишнее отбрасывается сразу.
+        """
+        self.ensure_alive(index)
+        inbox = self.inboxes[index]
+        try:
+            inbox.put_nowait(item)
+        except queue.Full:
+            if self.congested[index]:
+                return False
+            try:
+                await asyncio.to_thread(inbox.put, item, True, PUT_TIMEOUT)
+            except queue.Full:
+                self.congested[index] = True
+                return False
+        self.congested[index] = False
+        return True
+
+    async def route(self, update: dict):
+        """Отправить обновление воркеру, закреплённому за пользователем"""
+        index = shard_key(update) % len(self.inboxes)
+        if not await self._put(index, ("update", update)):
+            event_type = next((key for key in update if key != "update_id"), "unknown")
+            metrics.UPDATES_DROPPED.inc(event_type, "shard_full")
+            logging.warning("worker%d inbox is full, update %s dropped", index, update.get("update_id"))
+
+    async def relay_invalidations(self):
+        """Пересылать инвалидации кэшей от одного воркера всем остальным"""
+        while True:
+            origin, topic = await asyncio.to_thread(self.control.get)
+            if topic is None:
+                break
+            for i in range(len(self.inboxes)):
+                if i != origin and not await self._put(i, ("invalidate", topic)):
+                    logging.warning("worker%d inbox is full, %s invalidation dropped", i, topic)
+
+    def stop(self):
+        self.stopping = True
+        self.control.put((None, None))
+        for inbox in self.inboxes:
+            try:
+                inbox.put(None, timeout=PUT_TIMEOUT)
+            except queue.Full:
+                pass
+        for process in self.processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+                process.join(timeout=1)
+
+
+async def _poll(bot: Bot, dp: Dispatcher, shards: Shards):
+    """Long polling на фронте: сырые обновления раздаются воркерам"""
+    offset = None
+    allowed_updates = dp.resolve_used_update_types()
+    while True:
+        try:
+            updates = await bot.get_updates(offset=offset, timeout=30, allowed_updates=allowed_updates)
+        except Exception as e:
+            logging.warning("get_updates failed: %s", e)
+            await asyncio.sleep(1)
+            continue
+
+        for update in updates:
+            offset = update.update_id + 1
+            await shards.route(update.model_dump(mode="json", exclude_none=True, by_alias=True))
+
+
+def webhook_handler(shards: Shards):
+    """aiohttp-обработчик webhook, который только маршрутизирует обновления"""
+    async def handle(request: web.Request) -> web.Response:
+        token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+        if not secrets.compare_digest(token, WEBHOOK_SECRET):
+            return web.Response(status=401, text="Unauthorized")
+        await shards.route(await request.json())
+        return web.Response()
+    return handle
+
+
+async def run_sharded(bot: Bot, dp: Dispatcher, serve_webhook: Callable[..., Awaitable[None]]):
+    """Запуск в режиме WORKERS процессов
+
+    Фронт (этот процесс) получает обновления — polling или webhook
+    (serve_webhook запускает HTTP-сервер с переданным обработчиком) —
+    и раздаёт их воркерам по id пользователя. Каждый воркер — отдельный
+    Dispatcher со своими роутерами и памятью; SQLite работает в режиме WAL,
+    поэтому процессы читают параллельно, а запись сериализуется блокировкой БД.
+    """
+    shards = Shards(WORKERS)
+    shards.start()
+    relay = asyncio.create_task(shards.relay_invalidations())
+    supervisor = asyncio.create_task(shards.supervise())
+    logging.info("🧩 Started %d workers", WORKERS)
+
+    try:
+        if BOT_MODE == "webhook":
+            await serve_webhook(webhook_handler(shards))
+        else:
+            await _poll(bot, dp, shards)
+    finally:
+        supervisor.cancel()
+        await asyncio.to_thread(shards.stop)
+        await relay